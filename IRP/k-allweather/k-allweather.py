@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
-import math
-from datetime import datetime
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
 import pandas as pd
 import FinanceDataReader as fdr
 
@@ -18,22 +22,71 @@ ASSETS = [
     {"종목명": "TIGER KOFR금리액티브(합성)",     "종목코드": "449170", "비율": 0.05},
 ]
 
+# 최근 종가만 필요하므로 최근 2주치만 조회 (주말/연휴 포함해도 거래일이 남는 길이)
+LAST_PRICE_LOOKBACK_DAYS = 14
+
+# 당일 한정 가격 캐시 (같은 날 재실행 시 네트워크 대신 로컬 parquet 사용)
+_CACHE_DIR = Path(".fdr_cache")
+
+def cached_reader(code: str, start: Optional[str] = None) -> pd.DataFrame:
+    """
+    fdr.DataReader(code, start) 결과를 종목코드당 parquet 하나로 캐시 (Close/Volume만 저장해 용량 축소).
+    - 캐시 파일 수정일이 오늘이고 저장된 구간이 start를 덮으면 디스크에서 읽어 start 이후만 잘라 반환
+    - 아니면 새로 받아 같은 파일에 덮어씀 (start가 날마다 바뀌어도 파일이 쌓이지 않음)
+    """
+    p = _CACHE_DIR / f"{code}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        df = pd.read_parquet(p, engine="pyarrow")
+        cached_start = df.attrs.get("start", "")  # "" = 전체 이력
+        if cached_start == "" or (start is not None and cached_start <= start):
+            return df if start is None else df.loc[start:]
+    df = fdr.DataReader(code, start)
+    if df is None or df.empty:
+        return df
+    df = df[[c for c in ("Close", "Volume") if c in df.columns]]
+    df.attrs["start"] = start or ""
+    _CACHE_DIR.mkdir(exist_ok=True)
+    df.to_parquet(p, engine="pyarrow")
+    return df
+
+def _retry(tries: int = 3, backoff: float = 1.0):
+    """동시 요청 시 FDR 쪽 일시적 실패(스로틀링 등)에 대비한 재시도 데코레이터 (지수 백오프)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            for attempt in range(tries):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    if attempt == tries - 1:
+                        raise
+                    time.sleep(backoff * (2 ** attempt))
+        return wrapper
+    return deco
+
+@_retry()
 def get_last_price(krx_code: str) -> float:
     """
     FinanceDataReader에서 KRX 종목코드의 최근 종가를 반환.
     장중에는 당일 데이터가 갱신되지 않았을 수 있음(이 경우 전일 종가 사용).
     """
-    df = fdr.DataReader(krx_code)  # KRX는 숫자코드 문자열 그대로 사용
+    start = (date.today() - timedelta(days=LAST_PRICE_LOOKBACK_DAYS)).isoformat()
+    df = cached_reader(krx_code, start)  # KRX는 숫자코드 문자열 그대로 사용
     if df is None or df.empty:
         raise RuntimeError(f"가격 조회 실패: {krx_code}")
     return float(df["Close"].iloc[-1])
 
 def build_allocation(total_krw: int) -> pd.DataFrame:
+    # 종목별 조회는 서로 독립적인 네트워크 I/O → 스레드풀로 동시에 요청
+    codes = [a["종목코드"] for a in ASSETS]
+    with ThreadPoolExecutor(max_workers=min(16, len(codes))) as ex:
+        prices = dict(zip(codes, ex.map(get_last_price, codes)))
+
     rows = []
     for a in ASSETS:
-        price = get_last_price(a["종목코드"])
+        price = prices[a["종목코드"]]
         target_amt = total_krw * a["비율"]
-        qty = math.floor(target_amt / price)  # 정수 주 구매
+        qty = int(target_amt // price)  # 정수 주 구매
         buy_amt = qty * price
         rows.append({
             "종목명": a["종목명"],
@@ -46,58 +99,61 @@ def build_allocation(total_krw: int) -> pd.DataFrame:
             "잔여(목표-실제)": target_amt - buy_amt,
         })
     df = pd.DataFrame(rows)
-    df.loc["합계", ["%비율","현재가"]] = [df["%비율"].sum(), None]
-    df.loc["합계","목표금액"] = df["목표금액"].sum()
-    df.loc["합계","실제매수금액"] = df["실제매수금액"].sum()
-    df.loc["합계","잔여(목표-실제)"] = df["잔여(목표-실제)"].sum()
+    # 합계 행은 dict로 만들어 한 번에 붙임 (나머지 컬럼은 빈 값)
+    sum_cols = ["%비율", "목표금액", "실제매수금액", "잔여(목표-실제)"]
+    total_row = pd.DataFrame([df[sum_cols].sum().to_dict()], index=["합계"])
+    df = pd.concat([df, total_row])
     df["투자금액"] = df["목표금액"]  # 요청 컬럼명에 맞춰 복제
     return df
 
 def save_to_excel(df: pd.DataFrame, total_krw: int, path: str):
-    # 보기 좋은 형식으로 저장
+    # 보기 좋은 형식으로 저장 (write-only 모드: 행 단위로 바로 기록해 셀 객체를 메모리에 쌓지 않음)
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.utils.dataframe import dataframe_to_rows
-    from openpyxl.styles import Alignment, Font, NamedStyle
+    from openpyxl.styles import Alignment, Font
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "K-올웨더(성장형)"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("K-올웨더(성장형)")
+
+    # 열 너비 (write-only 시트는 행 기록 전에 지정해야 함)
+    widths = [34,12,8,16,12,10,16,16]
+    for i, w in enumerate(widths, start=1):
+        ws.column_dimensions[chr(64+i)].width = w
+
+    # 서식 (행 루프 밖에서 한 번만 생성)
+    title_font = Font(size=14, bold=True)
+    title_align = Alignment(horizontal="center")
+    pct_fmt = "0.00%"
+    krw_fmt = '#,##0'
 
     # 제목
     title = f"K-올웨더 (성장형) 배분표 - 투자금액: {total_krw:,} KRW - 생성일 {datetime.now():%Y-%m-%d %H:%M}"
-    ws.append([title])
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=9)
-    ws["A1"].font = Font(size=14, bold=True)
-    ws["A1"].alignment = Alignment(horizontal="center")
+    c = WriteOnlyCell(ws, value=title)
+    c.font = title_font; c.alignment = title_align
+    ws.append([c])
+    ws.merged_cells.add("A1:I1")
 
-    # 데이터
+    # 데이터 (%비율: 합계 행 제외, 금액 컬럼: 합계 행 포함)
     out_cols = ["종목명","종목코드","%비율","투자금액","현재가","보유수량","실제매수금액","잔여(목표-실제)"]
     ws.append(out_cols)
-    for r in dataframe_to_rows(df[out_cols], index=False, header=False):
-        ws.append(r)
-
-    # 서식
-    pct = NamedStyle(name="pct"); pct.number_format = "0.00%"
-    krw = NamedStyle(name="krw"); krw.number_format = '#,##0'
-    if "pct" not in wb.named_styles: wb.add_named_style(pct)
-    if "krw" not in wb.named_styles: wb.add_named_style(krw)
-
-    for row in ws.iter_rows(min_row=3, min_col=3, max_col=3, max_row=ws.max_row-1):
-        for cell in row: cell.style = "pct"
-    for col in [4,5,7,8]:
-        for cell in ws.iter_rows(min_row=3, min_col=col, max_col=col, max_row=ws.max_row):
-            for c in cell: c.style = "krw"
-
-    # 열 너비
-    widths = [34,12,8,16,12,10,16,16]
-    for i, w in enumerate(widths, start=1):
-        ws.column_dimensions[chr(64+i)].width = w
+    last = len(df) - 1
+    for i, r in enumerate(dataframe_to_rows(df[out_cols], index=False, header=False)):
+        row = []
+        for col, v in enumerate(r, start=1):
+            cell = WriteOnlyCell(ws, value=v)
+            if col == 3 and i < last:
+                cell.number_format = pct_fmt
+            elif col in (4, 5, 7, 8):
+                cell.number_format = krw_fmt
+            row.append(cell)
+        ws.append(row)
 
     # 총 투자 대비 미집행 현금(잔여 합계)
     leftover = float(df.loc["합계","잔여(목표-실제)"])
     ws.append([])
-    ws.append(["미집행 현금(잔여 합계)", leftover])
-    ws["B{}".format(ws.max_row)].style = "krw"
+    c = WriteOnlyCell(ws, value=leftover); c.number_format = krw_fmt
+    ws.append(["미집행 현금(잔여 합계)", c])
 
     wb.save(path)
 
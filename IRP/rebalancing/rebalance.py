@@ -8,14 +8,35 @@ K-올웨더(성장형) 리밸런싱 계산기 - 현재가 기준
      '입력 총 평가금액' vs '리밸런싱 후 총 평가금액', '수수료 반영 가정 순가치' 비교.
 """
 
+import ast
 import math
+import time
+import asyncio
 import argparse
-from datetime import datetime
-from typing import Dict, Optional
-
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import openpyxl
 import pandas as pd
 import FinanceDataReader as fdr
 
+try:
+    from numba import njit
+except ImportError:  # numba 미설치 시 순수 파이썬(NumPy)으로 동일하게 동작
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp 미설치 시 기존 스레드풀(FDR) 경로만 사용
+    aiohttp = None
+
 
 # -----------------------
 # 목표 비중 (성장형) - 합계 1.0
@@ -32,6 +53,15 @@ TARGET_WEIGHTS: Dict[str, float] = {
     "449170": 0.05,  # TIGER KOFR금리액티브(합성)
 }
 
+# 현재가는 최근 종가만 쓰므로 최근 2주치만 조회 (주말/연휴 포함해도 거래일이 남는 길이)
+LAST_PRICE_LOOKBACK_DAYS = 14
+
+# 당일 한정 가격 캐시 디렉터리 (parquet)
+CACHE_DIR = Path(".fdr_cache")
+
+# 네이버 일봉 시세 엔드포인트 (aiohttp 비동기 조회용)
+NAVER_SISE_URL = "https://api.finance.naver.com/siseJson.naver"
+
 # 수량 컬럼 후보(우선순위)
 QTY_CANDIDATES = [
     "보유수량", "구매 수량", "수량", "리밸런싱후수량",
@@ -43,16 +73,38 @@ QTY_CANDIDATES = [
 
 def _normalize_code(x: Optional[object]) -> Optional[str]:
     """엑셀에서 읽은 종목코드를 안전하게 문자열로 정규화: 379800.0 -> '379800'"""
-    if pd.isna(x):
+    if x is None or (isinstance(x, float) and math.isnan(x)):
         return None
+    if isinstance(x, int):
+        return str(x)
     s = str(x).strip()
     if not s:
         return None
+    # 흔한 경우('379800', '379800.0')는 float 파싱/예외 처리 없이 바로 반환
+    if s.isdigit():
+        return s
+    if s.endswith(".0") and s[:-2].isdigit():
+        return s[:-2]
     try:
-        s = str(int(float(s)))  # '379800.0' -> '379800'
-    except Exception:
-        pass
-    return s
+        return str(int(float(s)))
+    except (ValueError, OverflowError):
+        return s
+
+
+def _retry(tries: int = 3, backoff: float = 1.0):
+    """동시 요청 시 FDR 쪽 일시적 실패(스로틀링 등)에 대비한 재시도 데코레이터 (지수 백오프)"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            for attempt in range(tries):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    if attempt == tries - 1:
+                        raise
+                    time.sleep(backoff * (2 ** attempt))
+        return wrapper
+    return deco
 
 
 def _pick_qty_column(df: pd.DataFrame) -> str:
@@ -74,8 +126,18 @@ def load_holdings(path: str) -> pd.DataFrame:
     작년 보유 데이터(엑셀)를 읽어 '종목명, 종목코드, 보유수량'으로 정규화.
     - 가격/금액/비중 등의 다른 컬럼은 무시
     - 목표에 없는 종목도 포함(이후 0% 비중 처리 → 전량 매도)
+    - 서식 파싱을 건너뛰는 read_only 모드로 첫 시트 값만 읽음.
+      data_only=True라 수식 셀은 저장된 계산값을 쓰므로, 수식이 있는 파일은 엑셀에서 한 번 열어 저장된 상태여야 함
     """
-    df = pd.read_excel(path)
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = list(wb.worksheets[0].values)  # wb.active는 저장 시 선택된 탭이라 pd.read_excel처럼 첫 시트를 명시
+    finally:
+        wb.close()
+    if not rows:
+        raise ValueError(f"입력 파일이 비어 있습니다: {path}")
+    header = [h if h is not None else f"Unnamed: {i}" for i, h in enumerate(rows[0])]
+    df = pd.DataFrame(rows[1:], columns=header)
 
     # 컬럼 매핑(유연)
     colmap = {}
@@ -90,21 +152,16 @@ def load_holdings(path: str) -> pd.DataFrame:
 
     qty_col = _pick_qty_column(df)
 
-    # 정규화
-    df["종목코드"] = df["종목코드"].apply(_normalize_code)
-    df = df[df["종목코드"].notna()]
-    df[qty_col] = pd.to_numeric(df[qty_col], errors="coerce").fillna(0).astype(int)
-
-    # 종목명 없으면 코드로 대체
-    if "종목명" not in df.columns:
-        df["종목명"] = df["종목코드"]
+    # 정규화: 코드/수량/종목명(없으면 코드로 대체)을 배열로 한 번에 만들고, 코드 없는 행은 마스크로 제외
+    codes = np.array([_normalize_code(x) for x in df["종목코드"]], dtype=object)
+    qtys = pd.to_numeric(df[qty_col], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+    names = df["종목명"].to_numpy() if "종목명" in df.columns else codes
+    mask = pd.notna(codes)
 
-    # 같은 코드 합산
-    df = df.groupby(["종목코드", "종목명"], as_index=False)[qty_col].sum()
-
-    # 표준 컬럼명
-    df = df.rename(columns={qty_col: "보유수량"})
-    df = df[df["보유수량"] > 0].reset_index(drop=True)
+    # 같은 코드 합산 → 합계 수량 > 0만 유지 (입력 파일 순서 유지, 정렬 생략)
+    df = pd.DataFrame({"종목명": names[mask], "종목코드": codes[mask], "보유수량": qtys[mask]})
+    df = df.groupby(["종목코드", "종목명"], as_index=False, sort=False)["보유수량"].sum()
+    df = df[df["보유수량"] > 0]
 
     if df.empty:
         raise ValueError("유효한 보유 종목(수량>0)이 없습니다. 파일 내용을 확인하세요.")
@@ -113,47 +170,172 @@ def load_holdings(path: str) -> pd.DataFrame:
 
 # ---------- 가격 조회 ----------
 
+def _read_cache(code: str, start: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """오늘 만든 캐시가 있고 저장된 구간이 start를 덮으면 start 이후만 잘라 반환, 아니면 None"""
+    p = CACHE_DIR / f"{code}.parquet"
+    if not (p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today()):
+        return None
+    df = pd.read_parquet(p, engine="pyarrow")
+    cached_start = df.attrs.get("start", "")  # "" = 전체 이력
+    if cached_start == "" or (start is not None and cached_start <= start):
+        return df if start is None else df.loc[start:]
+    return None
+
+
+def cached_reader(code: str, start: Optional[str] = None) -> pd.DataFrame:
+    """
+    fdr.DataReader(code, start) 결과를 종목코드당 parquet 하나로 캐시 (Close/Volume만 저장해 용량 축소).
+    - 캐시 파일 수정일이 오늘이고 저장된 구간이 start를 덮으면 디스크에서 읽어 start 이후만 잘라 반환
+    - 아니면 새로 받아 같은 파일에 덮어씀 (start가 날마다 바뀌어도 파일이 쌓이지 않음)
+    """
+    df = _read_cache(code, start)
+    if df is not None:
+        return df
+    df = fdr.DataReader(code, start)
+    if df is None or df.empty:
+        return df
+    return _write_cache(code, start, df)
+
+
+def _write_cache(code: str, start: Optional[str], df: pd.DataFrame) -> pd.DataFrame:
+    """Close/Volume만 남겨 조회 시작일(start)과 함께 종목코드별 parquet로 저장"""
+    df = df[[c for c in ("Close", "Volume") if c in df.columns]]
+    df.attrs["start"] = start or ""
+    CACHE_DIR.mkdir(exist_ok=True)
+    df.to_parquet(CACHE_DIR / f"{code}.parquet", engine="pyarrow")
+    return df
+
+
+@_retry()
+def _fetch_one(code: str) -> Tuple[str, float]:
+    """단일 종목 현재가(최근 종가) 조회 → (종목코드, 가격)"""
+    start = (date.today() - timedelta(days=LAST_PRICE_LOOKBACK_DAYS)).isoformat()
+    hist = cached_reader(code, start)
+    if hist is None or hist.empty:
+        raise RuntimeError(f"가격 조회 실패(빈 데이터): {code}")
+    return code, float(hist["Close"].iloc[-1])
+
+
+async def _fetch_naver(session, code: str) -> Tuple[str, pd.DataFrame]:
+    """네이버 siseJson에서 최근 일봉 조회 → (종목코드, Close/Volume 일봉 프레임)"""
+    today = date.today()
+    params = {
+        "symbol": code,
+        "requestType": "1",
+        "startTime": (today - timedelta(days=LAST_PRICE_LOOKBACK_DAYS)).strftime("%Y%m%d"),
+        "endTime": today.strftime("%Y%m%d"),
+        "timeframe": "day",
+    }
+    async with session.get(NAVER_SISE_URL, params=params) as r:
+        r.raise_for_status()
+        text = await r.text()
+    # 응답은 JSON이 아닌 파이썬 리터럴 형태: [['날짜', '시가', '고가', '저가', '종가', ...], ["20250102", ...], ...]
+    rows = ast.literal_eval(text.strip())
+    if len(rows) < 2:
+        raise ValueError(f"가격 조회 실패(빈 데이터): {code}")
+    header, body = rows[0], rows[1:]
+    cols = {"Close": header.index("종가")}
+    if "거래량" in header:
+        cols["Volume"] = header.index("거래량")
+    index = pd.to_datetime([str(r[0]).strip() for r in body], format="%Y%m%d").rename("Date")
+    return code, pd.DataFrame({k: [r[i] for r in body] for k, i in cols.items()}, index=index)
+
+
+async def _fetch_all_async(codes: list) -> list:
+    """세션 하나에서 모든 종목을 동시에 요청 (실패한 종목은 예외 객체로 반환)"""
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        return await asyncio.gather(*[_fetch_naver(session, c) for c in codes], return_exceptions=True)
+
+
 def fetch_prices_from_fdr(codes: pd.Series) -> Dict[str, float]:
-    """FDR에서 현재가(최근 종가) 조회"""
-    prices: Dict[str, float] = {}
+    """
+    현재가(최근 종가) 조회.
+    - 오늘 만든 가격 캐시(.fdr_cache)가 있는 종목은 그대로 사용
+    - 나머지는 aiohttp가 있으면 네이버 시세를 이벤트 루프 하나에서 동시에 요청
+    - aiohttp가 없거나 비동기 조회에 실패한 종목은 FDR 스레드풀 경로로 조회 (실패 종목은 출력)
+    """
+    norm = []
     for raw in codes.unique():
         code = _normalize_code(raw)
         if not code:
             raise RuntimeError(f"빈/잘못된 종목코드 발견: {raw!r}")
-        hist = fdr.DataReader(code)
-        if hist is None or hist.empty:
-            raise RuntimeError(f"가격 조회 실패(빈 데이터): {code}")
-        prices[code] = float(hist["Close"].iloc[-1])
-    return prices
+        norm.append(code)
+    if not norm:
+        return {}
+
+    # 오늘 받아 둔 캐시가 있는 종목은 네트워크 없이 바로 사용 (aiohttp 유무와 관계없이 같은 값)
+    prices: Dict[str, float] = {}
+    start = (date.today() - timedelta(days=LAST_PRICE_LOOKBACK_DAYS)).isoformat()
+    for code in norm:
+        hist = _read_cache(code, start)
+        if hist is not None and not hist.empty:
+            prices[code] = float(hist["Close"].iloc[-1])
+
+    pending = [c for c in norm if c not in prices]
+    if aiohttp is not None and pending:
+        # 네트워크/응답 형식 오류만 FDR 경로로 넘기고, 그 밖의 예외(코드 버그 등)는 그대로 올림
+        fallback_errors = (aiohttp.ClientError, asyncio.TimeoutError, ValueError, SyntaxError)
+        try:
+            results = asyncio.run(_fetch_all_async(pending))
+        except fallback_errors as e:
+            results = [e] * len(pending)
+        failed = []
+        for code, r in zip(pending, results):
+            if isinstance(r, fallback_errors):
+                failed.append(f"{code}({type(r).__name__}: {r})")
+            elif isinstance(r, BaseException):
+                raise r
+            else:
+                # FDR 경로와 같은 캐시 파일에 저장해 같은 날 재실행 시 네트워크 없이 읽음
+                prices[code] = float(_write_cache(code, start, r[1])["Close"].iloc[-1])
+        if failed:
+            print(f"⚠️ 네이버 시세 조회 실패 → FDR로 재조회: {', '.join(failed)}")
+
+    rest = [c for c in norm if c not in prices]
+    if rest:
+        with ThreadPoolExecutor(max_workers=min(16, len(rest))) as ex:
+            prices.update(ex.map(_fetch_one, rest))
+    return {c: prices[c] for c in norm}
 
 
 # ---------- 리밸런싱 코어 ----------
 
+@njit(cache=True)
+def _greedy(prices: np.ndarray, gaps: np.ndarray, leftover: float):
+    """gap 큰 순서대로 살 수 있는 만큼 매수 → (종목별 추가수량, 남은 현금)"""
+    order = np.argsort(-gaps, kind="mergesort")
+    adds = np.zeros(prices.shape[0], dtype=np.int64)
+    for i in order:
+        n = int(leftover // prices[i])
+        if n > 0:
+            adds[i] = n
+            leftover -= n * prices[i]
+    return adds, leftover
+
+
 def greedy_cash_spend(df: pd.DataFrame, leftover_cash: float) -> pd.DataFrame:
     """
-    내림으로 남은 현금을 '목표가치 - 리밸런싱후가치'가 큰 종목부터 1주씩 추가 매수.
+    내림으로 남은 현금을 '목표가치 - 리밸런싱후가치'가 큰 종목부터 추가 매수.
+    (순서대로 해당 종목을 살 수 있는 만큼 산 뒤 다음 종목으로 넘어감 → 1주씩 반복과 동일 결과)
     """
     if leftover_cash <= 0:
         return df
     df = df.copy()
-    df["gap_per_share"] = (df["목표가치"] - df["리밸런싱후가치"]) / df["현재가"]
-    order = df.sort_values("gap_per_share", ascending=False).index.tolist()
-
-    i = 0
-    while i < len(order):
-        idx = order[i]
-        price = df.at[idx, "현재가"]
-        if leftover_cash >= price:
-            df.at[idx, "거래수량"] += 1
-            df.at[idx, "리밸런싱후수량"] += 1
-            df.at[idx, "리밸런싱후가치"] = df.at[idx, "리밸런싱후수량"] * price
-            leftover_cash -= price
-        else:
-            i += 1
+    # 계산은 _greedy 커널(numba 있으면 JIT)에 맡기고, 결과 배열만 컬럼에 한 번에 되돌려 씀
+    prices = df["현재가"].to_numpy(dtype=np.float64)
+    gaps = (df["목표가치"].to_numpy(dtype=np.float64) - df["리밸런싱후가치"].to_numpy(dtype=np.float64)) / prices
+    adds, _ = _greedy(prices, gaps, float(leftover_cash))
+
+    after_qty = df["리밸런싱후수량"].to_numpy() + adds
+    df["거래수량"] = df["거래수량"].to_numpy() + adds
+    df["리밸런싱후수량"] = after_qty
+    df["리밸런싱후가치"] = after_qty * prices
 
     # 금액 재계산
-    df["매수금액"] = (df["거래수량"].clip(lower=0) * df["현재가"]).round()
-    df["매도금액"] = (-df["거래수량"].clip(upper=0) * df["현재가"]).round()
+    trades = df["거래수량"].to_numpy()
+    df["매수금액"] = np.rint(np.maximum(trades, 0) * prices)
+    df["매도금액"] = np.rint(-np.minimum(trades, 0) * prices)
     df["거래금액(순)"] = df["매수금액"] - df["매도금액"]
     return df
 
@@ -170,10 +352,12 @@ def compute_rebalance(holdings: pd.DataFrame,
     반환: (결과 DF, 요약 숫자 dict)
     """
     df = holdings.copy()
-    df["현재가"] = df["종목코드"].map(price_map).astype(float)
-    if df["현재가"].isna().any():
-        missing = df.loc[df["현재가"].isna(), "종목코드"].tolist()
-        raise ValueError(f"가격을 찾지 못한 코드: {missing}")
+    codes = df["종목코드"].to_numpy()
+    prices = np.fromiter((price_map.get(c, np.nan) for c in codes), dtype=np.float64, count=len(codes))
+    miss = np.isnan(prices)
+    if miss.any():
+        raise ValueError(f"가격을 찾지 못한 코드: {codes[miss].tolist()}")
+    df["현재가"] = prices
 
     # 현재 평가금액(현재가 × 보유수량)
     df["현재가치"] = df["보유수량"] * df["현재가"]
@@ -189,7 +373,7 @@ def compute_rebalance(holdings: pd.DataFrame,
     # 목표가치/목표수량(내림)
     df["목표가치"] = total_before * df["목표비중"]
     df["목표수량(raw)"] = df["목표가치"] / df["현재가"]
-    df["목표수량"] = df["목표수량(raw)"].apply(math.floor).astype(int)
+    df["목표수량"] = np.floor(df["목표수량(raw)"].to_numpy()).astype(np.int64)
 
     # 거래수량(양수=매수, 음수=매도)
     df["거래수량"] = (df["목표수량"] - df["보유수량"]).astype(int)
@@ -199,18 +383,16 @@ def compute_rebalance(holdings: pd.DataFrame,
     df["리밸런싱후가치"] = df["리밸런싱후수량"] * df["현재가"]
     total_after = float(df["리밸런싱후가치"].sum())  # 이론상 수수료 전에는 total_before와 거의 동일
 
-    # 금액 및 수수료
-    df["매수금액"] = (df["거래수량"].clip(lower=0) * df["현재가"])
-    df["매도금액"] = (-df["거래수량"].clip(upper=0) * df["현재가"])
-    if fee_rate > 0:
-        df["매수수수료"] = df["매수금액"] * fee_rate
-        df["매도수수료"] = df["매도금액"] * fee_rate
-    else:
-        df["매수수수료"] = 0.0
-        df["매도수수료"] = 0.0
-
-    df["매수금액"] = (df["매수금액"] + df["매수수수료"]).round()
-    df["매도금액"] = (df["매도금액"] - df["매도수수료"]).round()
+    # 금액 및 수수료 (원시 배열로 한 번에 계산)
+    trades = df["거래수량"].to_numpy()
+    buy = np.maximum(trades, 0) * prices
+    sell = -np.minimum(trades, 0) * prices
+    buy_fee = buy * fee_rate
+    sell_fee = sell * fee_rate
+    df["매수금액"] = np.rint(buy + buy_fee)
+    df["매도금액"] = np.rint(sell - sell_fee)
+    df["매수수수료"] = buy_fee
+    df["매도수수료"] = sell_fee
     df["거래금액(순)"] = df["매수금액"] - df["매도금액"]
 
     # 총액들 계산
@@ -5,14 +5,19 @@
 # - 비교 시트: EFA vs 251350 (12/24/36M 상관, 추적차, 거래량)
 
 import os
-from datetime import datetime
+import functools
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
 import numpy as np
 import pandas as pd
 import yfinance as yf
 
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
 
 # =========================
 # 기본 설정
@@ -20,6 +25,13 @@ from openpyxl.utils import get_column_letter
 OUT_DIR = "dual_momentum_out"
 os.makedirs(OUT_DIR, exist_ok=True)
 
+# 조회 시작일: 가장 긴 계산(36개월 월수익률 = 월말 37개) + 여유분 → 약 3.5년(42개월)
+HISTORY_START = (pd.Timestamp.today() - pd.DateOffset(months=42)).strftime("%Y-%m-01")
+
+# 당일 한정 다운로드 캐시 (parquet) + 프로세스 내 메모리 캐시
+CACHE_DIR = Path(OUT_DIR) / ".yf_cache"
+_FRAMES: dict[tuple[str, str], pd.DataFrame] = {}
+
 # =========================
 # 백데이터(의사결정) 티커
 # =========================
@@ -59,38 +71,99 @@ def ensure_series(x: pd.Series | pd.DataFrame) -> pd.Series:
         return x.iloc[:, 0].astype(float)
     return x.astype(float)
 
-def monthly_close(ticker: str, start="2010-01-01") -> pd.Series:
-    """야후에서 받아 월말 종가 Series로 반환."""
-    df = yf.download(ticker, start=start, progress=False)
+def _cache_path(ticker: str, start: str) -> Path:
+    return CACHE_DIR / f"{ticker}_{start}.parquet"
+
+def cached_batch_reader(tickers: list[str], start=HISTORY_START) -> dict[str, pd.DataFrame]:
+    """
+    여러 티커 일봉을 (ticker, start) 단위 parquet로 캐시. Close/Volume만 보관.
+    오늘 만든 캐시가 있는 티커는 디스크에서 읽고, 나머지는 yf.download 한 번으로 묶어서 받음.
+    """
+    frames: dict[str, pd.DataFrame] = {}
+    missing = []
+    for t in tickers:
+        p = _cache_path(t, start)
+        if (t, start) in _FRAMES:
+            frames[t] = _FRAMES[(t, start)]
+        elif p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+            frames[t] = _FRAMES[(t, start)] = pd.read_parquet(p, engine="pyarrow")
+        else:
+            missing.append(t)
+    if not missing:
+        return frames
+
+    raw = yf.download(missing, start=start, progress=False, auto_adjust=True, group_by="ticker")
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for t in missing:
+        if raw is None or raw.empty:
+            frames[t] = pd.DataFrame()
+            continue
+        if isinstance(raw.columns, pd.MultiIndex):
+            if t not in raw.columns.get_level_values(0):
+                frames[t] = pd.DataFrame()
+                continue
+            df = raw[t]
+        else:
+            df = raw
+        # 여러 시장을 묶어 받으면 인덱스가 합쳐지므로 해당 티커에 값이 없는 날은 제거
+        out = pd.DataFrame({c: ensure_series(df[c]) for c in ("Close", "Volume") if c in df}).dropna(how="all")
+        if not out.empty:
+            p = _cache_path(t, start)
+            out.to_parquet(p, engine="pyarrow")
+            # HISTORY_START가 달마다 바뀌므로 같은 티커의 이전 start 파일은 지워 캐시가 쌓이지 않게 함
+            for old in CACHE_DIR.glob(f"{t}_*.parquet"):
+                if old != p:
+                    old.unlink(missing_ok=True)
+        frames[t] = _FRAMES[(t, start)] = out
+    return frames
+
+def cached_reader(ticker: str, start=HISTORY_START) -> pd.DataFrame:
+    """단일 티커 일봉 (cached_batch_reader 래퍼)."""
+    return cached_batch_reader([ticker], start=start)[ticker]
+
+def batch_monthly_close(tickers: list[str], start=HISTORY_START) -> dict[str, pd.Series]:
+    """여러 티커를 한 번에 받아 {티커: 월말 종가 Series}로 반환. 데이터가 없으면 빈 Series."""
+    cached_batch_reader(tickers, start=start)  # 캐시에 없는 티커만 한 번에 요청
+    out = {}
+    for t in tickers:
+        try:
+            out[t] = monthly_close(t, start=start)
+        except RuntimeError:
+            out[t] = pd.Series(dtype=float)
+    return out
+
+@functools.lru_cache(maxsize=64)
+def monthly_close(ticker: str, start=HISTORY_START) -> pd.Series:
+    """야후에서 받아 월말 종가 Series로 반환. (같은 실행 안에서는 메모이즈, 반환값은 수정하지 말 것)"""
+    df = cached_reader(ticker, start=start)
     if df.empty or "Close" not in df:
         raise RuntimeError(f"{ticker} 데이터가 비어 있습니다.")
-    m = df["Close"].resample("M").last().dropna()
-    return ensure_series(m)
+    close = ensure_series(df["Close"])
+    # resample 대신 월(period) groupby로 월말 값 추출, 라벨은 해당 월 말일
+    m = close.groupby(close.index.to_period("M")).last().dropna()
+    m.index = m.index.to_timestamp(how="end").normalize()
+    return m
 
-def trailing_12m_return(monthly: pd.Series) -> float:
-    """최근 월말 기준 12개월 수익률 (비율, 0.1234=12.34%)."""
-    if len(monthly) < 13:
-        raise RuntimeError("12개월 수익률 계산에 필요한 월말 데이터가 부족합니다.")
-    p0 = float(monthly.iloc[-1])     # 최근 월말
-    p12 = float(monthly.iloc[-13])   # 12개월 전 월말
-    return (p0 / p12) - 1.0
+def trailing_12m_returns(monthly: dict[str, pd.Series], tickers: list[str]) -> np.ndarray:
+    """여러 티커의 12개월 수익률을 배열 나눗셈 한 번으로 계산. 월말 데이터가 13개 미만이면 NaN."""
+    p0 = np.array([monthly[t].iloc[-1] if len(monthly[t]) >= 13 else np.nan for t in tickers], dtype=float)
+    p12 = np.array([monthly[t].iloc[-13] if len(monthly[t]) >= 13 else np.nan for t in tickers], dtype=float)
+    return p0 / p12 - 1.0
 
 
 # =========================
 # 의사결정 로직 (듀얼모멘텀)
 # =========================
 def decide_allocation():
-    # 월말 시계열
-    m_spy = monthly_close("SPY")
-    m_efa = monthly_close("EFA")
-    m_bil = monthly_close("BIL")
-    m_agg = monthly_close("AGG")
-
-    # 최근 12M 수익률
-    r_spy = trailing_12m_return(m_spy)
-    r_efa = trailing_12m_return(m_efa)
-    r_bil = trailing_12m_return(m_bil)
-    r_agg = trailing_12m_return(m_agg)
+    # 월말 시계열 (4개 티커 한 번에 요청)
+    tickers = ["SPY", "EFA", "BIL", "AGG"]
+    monthly = batch_monthly_close(tickers)
+
+    # 최근 12M 수익률 (4개 티커를 한 번에)
+    rets = trailing_12m_returns(monthly, tickers)
+    if np.isnan(rets).any():
+        raise RuntimeError("12개월 수익률 계산에 필요한 월말 데이터가 부족합니다.")
+    r_spy, r_efa, r_bil, r_agg = rets.tolist()
 
     # 룰:
     # 1) SPY 12M > BIL 12M → SPY vs EFA 중 12M 높은 ETF
@@ -113,7 +186,8 @@ def decide_allocation():
     })
 
     # 배너 문구
-    alloc_text = " + ".join([f"{row['종목명']}({row['Code']}) {row['비중(%)']:.0f}%" for _, row in kr_alloc.iterrows()])
+    alloc_text = " + ".join(f"{name}({code}) {w:.0f}%" for name, code, w in
+                            kr_alloc[["종목명", "Code", "비중(%)"]].itertuples(index=False, name=None))
     banner = f"이번달 실제 투자 대상: {alloc_text}  |  결정근거: {rule_text}"
 
     # 기준자산의 12M(%) 값 (Allocation 시트에 참고용으로 넣기)
@@ -126,27 +200,23 @@ def decide_allocation():
 # Returns 시트 데이터 (미국/국내 모두)
 # =========================
 def build_returns_sheet_data():
-    rows = []
-
-    # 미국 ETF 12M
-    for t, label in US_TICKERS.items():
-        try:
-            r = trailing_12m_return(monthly_close(t)) * 100
-            rows.append(["미국", label, t, None, None, round(r, 2)])
-        except Exception:
-            rows.append(["미국", label, t, None, None, None])
-
-    # 국내 ETF 12M (야후 '.KS')
-    for code in KR_CODES:
-        y_ticker = f"{code}.KS"
-        label = f"국내 ETF {code}"
-        try:
-            r = trailing_12m_return(monthly_close(y_ticker)) * 100
-            rows.append(["국내", label, None, code, "KS", round(r, 2)])
-        except Exception:
-            rows.append(["국내", label, None, code, "KS", None])
-
-    return pd.DataFrame(rows, columns=["구분","자산라벨","US_Ticker","KR_Code","시장","12M수익률(%)"])
+    us_tickers = list(US_TICKERS)
+    kr_tickers = [f"{code}.KS" for code in KR_CODES]  # 국내 ETF (야후 '.KS')
+    n_us, n_kr = len(us_tickers), len(kr_tickers)
+
+    # 미국/국내를 한 번에 받아 12M 수익률(%)을 배열 연산 한 번으로 (데이터 부족은 NaN)
+    monthly = batch_monthly_close(us_tickers + kr_tickers)
+    rets = trailing_12m_returns(monthly, us_tickers + kr_tickers) * 100
+
+    # 라벨 열은 미국 → 국내 순으로 통째로 만들고, 수익률이 없는 티커만 사후에 None 처리
+    return pd.DataFrame({
+        "구분": ["미국"] * n_us + ["국내"] * n_kr,
+        "자산라벨": list(US_TICKERS.values()) + [f"국내 ETF {code}" for code in KR_CODES],
+        "US_Ticker": us_tickers + [None] * n_kr,
+        "KR_Code": [None] * n_us + list(KR_CODES),
+        "시장": [None] * n_us + ["KS"] * n_kr,
+        "12M수익률(%)": [None if np.isnan(r) else round(r, 2) for r in rets.tolist()],
+    })
 
 
 # =========================
@@ -159,8 +229,8 @@ def build_compare_efa_vs_251350():
       detail_df:  최근 36개월 월간 수익률(%) 시계열 비교표
     """
     # 월말 종가(Series 강제)
-    m_efa = monthly_close("EFA")
-    m_251 = monthly_close("251350.KS")
+    monthly = batch_monthly_close(["EFA", "251350.KS"])
+    m_efa, m_251 = monthly["EFA"], monthly["251350.KS"]
 
     # 공통 구간 정렬
     idx = m_efa.index.intersection(m_251.index)
@@ -174,28 +244,25 @@ def build_compare_efa_vs_251350():
     r_efa = r_efa.loc[ridx]
     r_251 = r_251.loc[ridx]
 
-    def _window_slice(s: pd.Series, months: int):
-        return s.iloc[-months:] if len(s) >= months else s.copy()
+    def _cumret(x: np.ndarray) -> float:
+        return float(np.expm1(np.log1p(x).sum())) if len(x) else np.nan
 
-    def _cumret(x: pd.Series) -> float:
-        return float((1.0 + x).prod() - 1.0) if len(x) else np.nan
+    # 최장 구간(36M)만 한 번 잘라 두고, 12/24M는 그 뒤쪽 view로 계산
+    windows = [12, 24, 36]
+    re_all = r_efa.iloc[-max(windows):].to_numpy()
+    rk_all = r_251.iloc[-max(windows):].to_numpy()
+    diff_all = rk_all - re_all
 
     rows = []
-    for win in [12, 24, 36]:
-        re = _window_slice(r_efa, win)
-        rk = _window_slice(r_251, win)
-        # 길이/정렬 동일 보장
-        ridx2 = re.index.intersection(rk.index)
-        re = re.loc[ridx2]
-        rk = rk.loc[ridx2]
-
-        if len(re) > 2 and len(rk) == len(re):
+    for win in windows:
+        re, rk, diff = re_all[-win:], rk_all[-win:], diff_all[-win:]
+
+        if len(re) > 2:
             # Series.corr 대신 np.corrcoef로 안전 계산
-            corr_val = float(np.corrcoef(re.values, rk.values)[0, 1])
+            corr_val = float(np.corrcoef(re, rk)[0, 1])
             cum_diff = _cumret(rk) - _cumret(re)
-            diff = (rk - re)
             mean_diff = float(diff.mean())
-            te_monthly = float(diff.std(ddof=1)) if len(diff) > 2 else np.nan
+            te_monthly = float(np.std(diff, ddof=1))
             te_annual = te_monthly * np.sqrt(12) if np.isfinite(te_monthly) else np.nan
         else:
             corr_val = cum_diff = mean_diff = te_monthly = te_annual = np.nan
@@ -214,9 +281,9 @@ def build_compare_efa_vs_251350():
         "평균 월간 차이(%, 국내−EFA)", "Tracking Error(月, %)", "Tracking Error(연율, %)"
     ])
 
-    # 거래량 비교(최근 3개월, 일봉)
-    d_efa = yf.download("EFA", period="4mo", interval="1d", progress=False)
-    d_251 = yf.download("251350.KS", period="4mo", interval="1d", progress=False)
+    # 거래량 비교(최근 3개월, 일봉) — 월말 종가용으로 이미 받아둔 캐시 재사용
+    d_efa = cached_reader("EFA")
+    d_251 = cached_reader("251350.KS")
 
     def last_n_months_mean_median_vol(df: pd.DataFrame, days=90):
         if df is None or df.empty or "Volume" not in df:
@@ -248,156 +315,149 @@ def build_compare_efa_vs_251350():
 # =========================
 # 엑셀 저장
 # =========================
-def autosize_columns(ws, max_width=46):
-    widths = {}
-    for row in ws.iter_rows(values_only=True):
+# 서식 객체는 모듈 로드 시 한 번만 생성해 모든 시트/셀에서 공유 (색상은 8자리 ARGB)
+TITLE_FONT = Font(size=14, bold=True)
+BOLD = Font(bold=True)
+CENTER = Alignment(horizontal="center")
+TITLE_ALIGN = Alignment(horizontal="center", vertical="center")
+TITLE_FILL = PatternFill("solid", fgColor="FFE6F0FF")
+HDR_FILL = PatternFill("solid", fgColor="FFF2F2F2")
+THIN = Side(style="thin", color="FFD9D9D9")
+BORDER_ALL = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+
+def autosize_columns(ws, rows, max_width=46):
+    """write-only 시트는 되읽기가 안 되므로, 기록할 행 목록으로 열 너비를 미리 계산해 지정."""
+    widths = defaultdict(int)
+    for row in rows:
         for i, v in enumerate(row, start=1):
-            v = "" if v is None else str(v)
-            widths[i] = max(widths.get(i, 0), len(v))
+            if isinstance(v, Cell):
+                v = v.value
+            n = 0 if v is None else len(str(v))  # 빈 셀도 widths[i] 조회로 열이 등록됨(최소 너비 적용)
+            if n > widths[i]:
+                widths[i] = n
     for i, w in widths.items():
         ws.column_dimensions[get_column_letter(i)].width = min(max(w + 2, 10), max_width)
 
+def write_rows(ws, rows, max_width=46):
+    """열 너비 지정 후 행을 순서대로 스트리밍 기록."""
+    autosize_columns(ws, rows, max_width=max_width)
+    for row in rows:
+        ws.append(row)
+
 def save_excel(summary: pd.DataFrame, alloc: pd.DataFrame, banner: str, chosen_us: str, chosen_12m_pct: float,
                returns_df: pd.DataFrame, cmp_metrics: pd.DataFrame, cmp_vol: pd.DataFrame, cmp_detail: pd.DataFrame):
     month_str = datetime.now().strftime("%Y-%m")
     xlsx_path = os.path.join(OUT_DIR, f"dualmo_report_{month_str}.xlsx")
 
-    wb = Workbook()
-    wb.remove(wb.active)
-
-    title_fill = PatternFill("solid", fgColor="E6F0FF")
-    header_fill = PatternFill("solid", fgColor="F2F2F2")
-    thin = Side(style="thin", color="D9D9D9")
-    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
+    # write-only 모드: 시트별로 행 목록을 만든 뒤 한 번에 스트리밍 기록
+    wb = Workbook(write_only=True)
+
+    # 헤더 서식은 NamedStyle 하나로 등록해 셀마다 이름으로만 지정
+    hdr = NamedStyle(name="hdr", font=BOLD, fill=HDR_FILL, border=BORDER_ALL, alignment=CENTER)
+    wb.add_named_style(hdr)
+    # 숫자 서식 셀도 테두리+서식을 NamedStyle로 묶어 셀당 스타일 지정 한 번으로 처리
+    wb.add_named_style(NamedStyle(name="pct", border=BORDER_ALL, number_format="0.00%"))
+    wb.add_named_style(NamedStyle(name="num2", border=BORDER_ALL, number_format="0.00"))
+
+    def title_row(ws, text, span):
+        c = WriteOnlyCell(ws, value=text)
+        c.font = TITLE_FONT; c.fill = TITLE_FILL
+        c.alignment = TITLE_ALIGN
+        ws.merged_cells.add(f"A1:{get_column_letter(span)}1")
+        ws.row_dimensions[1].height = 24
+        return [c] + [None] * (span - 1)
+
+    def bold_row(ws, text):
+        c = WriteOnlyCell(ws, value=text)
+        c.font = BOLD
+        return [c]
+
+    def header_row(ws, columns):
+        row = []
+        for h in columns:
+            cell = WriteOnlyCell(ws, value=h)
+            cell.style = "hdr"
+            row.append(cell)
+        return row
+
+    def data_row(ws, values):
+        row = []
+        for val in values:
+            cell = WriteOnlyCell(ws, value=val)
+            cell.border = BORDER_ALL
+            row.append(cell)
+        return row
 
     # === Sheet 1: Decision (미국ETF 12M 수익률 요약) ===
     ws1 = wb.create_sheet("Decision")
-    ws1.merge_cells(start_row=1, start_column=1, end_row=1, end_column=6)
-    c = ws1.cell(row=1, column=1, value=f"SPY/EFA/BIL 12M 모멘텀 의사결정 — {month_str}")
-    c.font = Font(size=14, bold=True); c.fill = title_fill
-    c.alignment = Alignment(horizontal="center", vertical="center")
-    ws1.row_dimensions[1].height = 24
-
-    ws1.cell(row=3, column=1, value=banner).font = Font(bold=True)
-
-    for col, h in enumerate(summary.columns, start=1):
-        cell = ws1.cell(row=5, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-
-    for r_idx, row in enumerate(summary.itertuples(index=False), start=6):
-        for c_idx, val in enumerate(row, start=1):
-            cell = ws1.cell(row=r_idx, column=c_idx, value=val)
-            cell.border = border_all
-            if summary.columns[c_idx-1].endswith("(%)") and isinstance(val, (int, float)):
-                cell.number_format = "0.00%"; cell.value = val / 100.0
+    rows = [title_row(ws1, f"SPY/EFA/BIL 12M 모멘텀 의사결정 — {month_str}", 6), [],
+            bold_row(ws1, banner), [],
+            header_row(ws1, summary.columns)]
+    is_pct = [c.endswith("(%)") for c in summary.columns]  # 열별 퍼센트 여부는 한 번만 판정
+    for row in summary.itertuples(index=False):
+        cells = data_row(ws1, row)
+        for pct, cell, val in zip(is_pct, cells, row):
+            if pct and isinstance(val, (int, float)):
+                cell.style = "pct"; cell.value = val / 100.0
+        rows.append(cells)
 
     ws1.freeze_panes = "A6"
-    autosize_columns(ws1, max_width=36)
+    write_rows(ws1, rows, max_width=36)
 
     # === Sheet 2: Allocation (실제 투자) ===
     ws2 = wb.create_sheet("Allocation")
-    ws2.merge_cells(start_row=1, start_column=1, end_row=1, end_column=7)
-    c2 = ws2.cell(row=1, column=1, value=f"실제 투자 배분 (국내 ETF) — {month_str}")
-    c2.font = Font(size=14, bold=True); c2.fill = title_fill
-    c2.alignment = Alignment(horizontal="center", vertical="center")
-    ws2.row_dimensions[1].height = 24
-
     headers2 = ["분류","종목명","Code","환율","비중(%)","(참고) 기준자산","(참고) 기준자산 12M(%)"]
-    for col, h in enumerate(headers2, start=1):
-        cell = ws2.cell(row=3, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-
-    r_idx = 4
-    for _, row in alloc.iterrows():
-        ws2.cell(row=r_idx, column=1, value=row["분류"]).border = border_all
-        ws2.cell(row=r_idx, column=2, value=row["종목명"]).border = border_all
-        ws2.cell(row=r_idx, column=3, value=row["Code"]).border = border_all
-        ws2.cell(row=r_idx, column=4, value=row["환율"]).border = border_all
-
-        pct = float(row["비중(%)"]) / 100.0
-        c = ws2.cell(row=r_idx, column=5, value=pct)
-        c.border = border_all; c.number_format = "0.00%"
-
-        ws2.cell(row=r_idx, column=6, value=US_TICKERS[chosen_us]).border = border_all
-
-        c12 = ws2.cell(row=r_idx, column=7, value=chosen_12m_pct / 100.0)
-        c12.border = border_all; c12.number_format = "0.00%"
-
-        r_idx += 1
+    rows = [title_row(ws2, f"실제 투자 배분 (국내 ETF) — {month_str}", 7), [],
+            header_row(ws2, headers2)]
+    alloc_cols = ["분류", "종목명", "Code", "환율", "비중(%)"]
+    us_label, chosen_pct = US_TICKERS[chosen_us], chosen_12m_pct / 100.0  # 모든 행에 같은 참고값
+    for 분류, 종목명, code, 환율, 비중 in alloc[alloc_cols].itertuples(index=False, name=None):
+        cells = data_row(ws2, [분류, 종목명, code, 환율, float(비중) / 100.0, us_label, chosen_pct])
+        cells[4].style = "pct"
+        cells[6].style = "pct"
+        rows.append(cells)
 
     ws2.freeze_panes = "A4"
-    autosize_columns(ws2, max_width=46)
+    write_rows(ws2, rows, max_width=46)
 
     # === Sheet 3: Returns (미국/국내 각 자산 12M 수익률) ===
     ws3 = wb.create_sheet("Returns")
-    ws3.merge_cells(start_row=1, start_column=1, end_row=1, end_column=6)
-    c3 = ws3.cell(row=1, column=1, value=f"각 자산 12개월 수익률 — {month_str}")
-    c3.font = Font(size=14, bold=True); c3.fill = title_fill
-    c3.alignment = Alignment(horizontal="center", vertical="center")
-    ws3.row_dimensions[1].height = 24
-
-    for col, h in enumerate(returns_df.columns, start=1):
-        cell = ws3.cell(row=3, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-
-    for r_idx, row in enumerate(returns_df.itertuples(index=False), start=4):
-        for c_idx, val in enumerate(row, start=1):
-            cell = ws3.cell(row=r_idx, column=c_idx, value=val)
-            cell.border = border_all
-            if returns_df.columns[c_idx-1].endswith("(%)") and isinstance(val, (int, float)):
-                cell.number_format = "0.00%"; cell.value = val / 100.0
-
-    autosize_columns(ws3, max_width=46)
+    rows = [title_row(ws3, f"각 자산 12개월 수익률 — {month_str}", 6), [],
+            header_row(ws3, returns_df.columns)]
+    is_pct = [c.endswith("(%)") for c in returns_df.columns]
+    for row in dataframe_to_rows(returns_df, index=False, header=False):
+        cells = data_row(ws3, row)
+        for pct, cell, val in zip(is_pct, cells, row):
+            if pct and isinstance(val, (int, float)):
+                cell.style = "pct"; cell.value = val / 100.0
+        rows.append(cells)
+
+    write_rows(ws3, rows, max_width=46)
 
     # === Sheet 4: Compare_EFA_vs_251350 ===
     ws4 = wb.create_sheet("Compare_EFA_vs_251350")
-    ws4.merge_cells(start_row=1, start_column=1, end_row=1, end_column=8)
-    c4 = ws4.cell(row=1, column=1, value=f"EFA vs KODEX MSCI선진국(251350) 비교 — {month_str}")
-    c4.font = Font(size=14, bold=True); c4.fill = title_fill
-    c4.alignment = Alignment(horizontal="center", vertical="center")
-    ws4.row_dimensions[1].height = 24
+    rows = [title_row(ws4, f"EFA vs KODEX MSCI선진국(251350) 비교 — {month_str}", 8), []]
 
     # (A) 상관/추적 지표 표
-    ws4.cell(row=3, column=1, value="A. 상관 & 추적지표").font = Font(bold=True)
-    start_row = 5
-    for col, h in enumerate(cmp_metrics.columns, start=1):
-        cell = ws4.cell(row=start_row, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-
-    for r_idx, row in enumerate(cmp_metrics.itertuples(index=False), start=start_row+1):
-        for c_idx, val in enumerate(row, start=1):
-            ws4.cell(row=r_idx, column=c_idx, value=val).border = border_all
+    rows += [bold_row(ws4, "A. 상관 & 추적지표"), [], header_row(ws4, cmp_metrics.columns)]
+    for row in cmp_metrics.itertuples(index=False):
+        rows.append(data_row(ws4, row))
 
     # (B) 최근 3개월 거래량 표
-    r2 = start_row + 1 + len(cmp_metrics) + 2
-    ws4.cell(row=r2, column=1, value="B. 최근 3개월 일별 거래량(단순)").font = Font(bold=True)
-    for col, h in enumerate(cmp_vol.columns, start=1):
-        cell = ws4.cell(row=r2+2, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-    for r_idx, row in enumerate(cmp_vol.itertuples(index=False), start=r2+3):
-        for c_idx, val in enumerate(row, start=1):
-            ws4.cell(row=r_idx, column=c_idx, value=val).border = border_all
+    rows += [[], [], bold_row(ws4, "B. 최근 3개월 일별 거래량(단순)"), [], header_row(ws4, cmp_vol.columns)]
+    for row in cmp_vol.itertuples(index=False):
+        rows.append(data_row(ws4, row))
 
     # (C) 최근 36개월 월수익률(%) 비교표
-    r3 = r2 + 3 + len(cmp_vol) + 2
-    ws4.cell(row=r3, column=1, value="C. 최근 36개월 월간 수익률(%)").font = Font(bold=True)
-    for col, h in enumerate(cmp_detail.columns, start=1):
-        cell = ws4.cell(row=r3+2, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-    for r_idx, row in enumerate(cmp_detail.itertuples(index=False), start=r3+3):
-        for c_idx, val in enumerate(row, start=1):
-            cell = ws4.cell(row=r_idx, column=c_idx, value=val)
-            cell.border = border_all
+    rows += [[], [], bold_row(ws4, "C. 최근 36개월 월간 수익률(%)"), [], header_row(ws4, cmp_detail.columns)]
+    for row in cmp_detail.itertuples(index=False):
+        cells = data_row(ws4, row)
+        for c_idx, (cell, val) in enumerate(zip(cells, row), start=1):
             if c_idx >= 2 and isinstance(val, (int, float)):
-                cell.number_format = "0.00"
+                cell.style = "num2"
+        rows.append(cells)
 
-    autosize_columns(ws4, max_width=52)
+    write_rows(ws4, rows, max_width=52)
 
     # 저장
     wb.save(xlsx_path)
@@ -408,6 +468,9 @@ def save_excel(summary: pd.DataFrame, alloc: pd.DataFrame, banner: str, chosen_u
 # main
 # =========================
 if __name__ == "__main__":
+    # 전체 티커를 한 번에 받아 캐시 → 이후 단계(EFA 등 중복 티커 포함)는 모두 캐시에서 읽음
+    cached_batch_reader(list(US_TICKERS) + [f"{code}.KS" for code in KR_CODES])
+
     # 듀얼모멘텀 의사결정 및 기본 시트
     summary_df, alloc_df, banner_txt, chosen_us, chosen_12m_pct = decide_allocation()
     returns_df = build_returns_sheet_data()
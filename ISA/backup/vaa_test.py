@@ -3,10 +3,14 @@
 # VAA 전략 자산군(미국 ETF) vs 국내 대체 ETF 상관관계 및 추적오차 분석 리포트
 
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
 import pandas as pd
 import numpy as np
 import yfinance as yf
+from curl_cffi import requests as curl_requests
 import FinanceDataReader as fdr
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
@@ -18,6 +22,13 @@ from openpyxl.utils import get_column_letter
 OUT_DIR = "vaa_analysis_out"
 os.makedirs(OUT_DIR, exist_ok=True)
 
+# 당일 한정 다운로드 캐시 (parquet, 종가만 보관)
+CACHE_DIR = Path(OUT_DIR) / ".cache"
+
+# 환율은 스크립트(vaa, vaa_test)끼리 공유하는 캐시에 가장 이른 시작일부터 받아 두고 필요한 구간만 잘라 씀
+FX_CACHE_DIR = Path(".fx_cache")
+FX_HISTORY_START = "2010-01-01"
+
 # vaa.py에 정의된 매핑 정보
 # 환노출: 미국 ETF(USD) * 환율 = 국내 ETF(KRW) 움직임 예상
 # 환해지: 미국 ETF(USD)       = 국내 ETF(KRW) 움직임 예상
@@ -31,32 +42,104 @@ ASSET_PAIRS = {
     "SHY": {"KR_Code": "440650", "KR_Name": "ACE 미국달러단기채권엑티브",     "Hedge": False}, # 환노출
 }
 
+# yf.download는 내부 전역 상태를 공유해 동시 호출에 안전하지 않으므로 직렬화
+_YF_LOCK = threading.Lock()
+
+# 야후 요청이 연결(TCP/TLS)을 재사용하도록 세션 하나를 공유 (yfinance는 curl_cffi 세션만 받음)
+YF_SESSION = curl_requests.Session(impersonate="chrome")
+
 # =========================================================
 # 2. 데이터 다운로드 유틸리티
 # =========================================================
+def ensure_series(x):
+    """Close 등에서 뽑은 뒤에도 가끔 DataFrame이 남는 케이스 방지: 1열 Series 강제."""
+    if isinstance(x, pd.DataFrame):
+        return x.iloc[:, 0].astype(float)
+    return x.astype(float)
+
+def _download_close(ticker, start):
+    """야후 파이낸스(미국) 또는 FDR(한국/환율)에서 종가 Series 다운로드"""
+    # 한국 ETF (숫자로 구성되거나 .KS 등)
+    if ticker.isdigit() or ticker.endswith(".KS"):
+        df = fdr.DataReader(ticker, start=start)
+        if df is None or df.empty:
+            return pd.Series(dtype=float)
+        return df['Close']
+
+    # 미국 ETF (문자열)
+    with _YF_LOCK:
+        df = yf.download(ticker, start=start, progress=False, auto_adjust=True, session=YF_SESSION)
+    if df.empty:
+        return pd.Series(dtype=float)
+
+    # 멀티인덱스 컬럼(yfinance 최신 버전)이면 df["Close"]가 1열 DataFrame → Series로 정규화
+    return ensure_series(df["Close"])
+
+def read_fx_daily(sym: str, start="2010-01-01") -> pd.DataFrame:
+    """
+    환율 일봉(Close)을 실행 위치의 공용 parquet 캐시(FX_CACHE_DIR)로 vaa/vaa_test가 함께 사용.
+    - 캐시 파일 수정일이 오늘이면 디스크에서 읽고, 아니면 FX_HISTORY_START부터 새로 받아 덮어씀
+    - 반환은 start 이후 구간만
+    """
+    p = FX_CACHE_DIR / f"{sym.replace('/', '-')}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        df = pd.read_parquet(p, engine="pyarrow")
+    else:
+        df = fdr.DataReader(sym, FX_HISTORY_START)
+        if df is None or df.empty:
+            return df
+        df = df[["Close"]]
+        FX_CACHE_DIR.mkdir(exist_ok=True)
+        df.to_parquet(p, engine="pyarrow")
+    return df.loc[pd.Timestamp(start):]
+
+def cached_close(ticker, start):
+    """
+    (ticker, start) 단위 parquet 캐시를 거쳐 종가 Series 반환.
+    - 캐시 파일 수정일이 오늘이면 디스크에서 읽고, 아니면 새로 받아 덮어씀
+    """
+    p = CACHE_DIR / f"{ticker.replace('/', '-')}_{start}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        return pd.read_parquet(p, engine="pyarrow")["Close"]
+    s = _download_close(ticker, start)
+    if not s.empty:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        s.to_frame("Close").to_parquet(p, engine="pyarrow")
+    return s
+
+def prefetch_us_close(tickers, start="2018-01-01"):
+    """
+    미국 티커 중 오늘 캐시가 없는 것만 yf.download 한 번으로 묶어 받아 캐시에 저장.
+    이후 get_data는 캐시에서 읽고, 여기서 받지 못한 티커만 개별로 다시 요청함.
+    """
+    missing = []
+    for t in tickers:
+        p = CACHE_DIR / f"{t}_{start}.parquet"
+        if not (p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today()):
+            missing.append(t)
+    if not missing:
+        return
+    try:
+        with _YF_LOCK:
+            raw = yf.download(missing, start=start, progress=False, auto_adjust=True,
+                              group_by="ticker", session=YF_SESSION)
+    except Exception as e:
+        print(f"❌ 일괄 다운로드 실패 ({', '.join(missing)}): {e}")
+        return
+    if raw is None or raw.empty:
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for t in missing:
+        if t not in raw.columns.get_level_values(0):
+            continue
+        s = ensure_series(raw[t]["Close"]).dropna()
+        if not s.empty:
+            s.to_frame("Close").to_parquet(CACHE_DIR / f"{t}_{start}.parquet", engine="pyarrow")
+
 def get_data(ticker, start="2018-01-01"):
     """야후 파이낸스(미국) 또는 FDR(한국) 데이터 다운로드"""
     try:
-        # 한국 ETF (숫자로 구성되거나 .KS 등)
-        if ticker.isdigit() or ticker.endswith(".KS"):
-            df = fdr.DataReader(ticker, start=start)
-            if df is None or df.empty:
-                return pd.Series(dtype=float)
-            return df['Close']
-        
-        # 미국 ETF (문자열)
-        else:
-            df = yf.download(ticker, start=start, progress=False, auto_adjust=True)
-            if df.empty:
-                return pd.Series(dtype=float)
-            
-            # 멀티인덱스 컬럼 처리 (yfinance 최신 버전)
-            if isinstance(df.columns, pd.MultiIndex):
-                try:
-                    return df["Close"][ticker]
-                except KeyError:
-                    return df.iloc[:, 0]
-            return df["Close"]
+        return cached_close(ticker, start)
     except Exception as e:
         print(f"❌ 데이터 다운로드 실패 ({ticker}): {e}")
         return pd.Series(dtype=float)
@@ -64,8 +147,7 @@ def get_data(ticker, start="2018-01-01"):
 def get_usdkrw(start="2018-01-01"):
     """환율 데이터 (USD/KRW)"""
     try:
-        df = fdr.DataReader("USD/KRW", start=start)
-        return df['Close']
+        return read_fx_daily("USD/KRW", start)['Close']
     except Exception as e:
         print(f"❌ 환율 데이터 실패: {e}")
         return pd.Series(dtype=float)
@@ -110,35 +192,38 @@ def analyze_pair(us_ticker, kr_info, fx_series):
     bm_ret = bm_ret.loc[idx]
     kr_ret = kr_ret.loc[idx]
 
-    # 월간 데이터로 변환 (상관계수 계산용)
-    bm_monthly = (1 + bm_ret).resample('M').prod() - 1
-    kr_monthly = (1 + kr_ret).resample('M').prod() - 1
+    # 월간 데이터로 변환 (상관계수 계산용): 월말 가격 기준 수익률 (bm_ret/kr_ret은 일간 추적오차에만 사용)
+    bm_monthly = benchmark.resample('ME').last().dropna().pct_change().dropna()
+    kr_monthly = kr_s.resample('ME').last().dropna().pct_change().dropna()
     
-    # 분석 지표 계산 함수
+    # 분석 지표 계산 함수 (배열은 한 번만 꺼내고, 각 구간은 뒤에서 자른 뷰로 계산)
+    b_all = bm_monthly.to_numpy()
+    k_all = kr_monthly.to_numpy()
+    diff_all = kr_ret.to_numpy() - bm_ret.to_numpy()
+
     def calc_metrics(window_months):
-        if len(bm_monthly) < window_months:
+        if len(b_all) < window_months:
             return np.nan, np.nan, np.nan
-        
-        b = bm_monthly.iloc[-window_months:]
-        k = kr_monthly.iloc[-window_months:]
-        
+
+        b = b_all[-window_months:]
+        k = k_all[-window_months:]
+
         # 상관계수
         corr = np.corrcoef(b, k)[0, 1]
-        
-        # 누적 수익률 차이
-        cum_b = (1 + b).prod() - 1
-        cum_k = (1 + k).prod() - 1
+
+        # 누적 수익률 차이 (log1p 합 → expm1: 곱셈 누적보다 수치적으로 안정)
+        cum_b = np.expm1(np.log1p(b).sum())
+        cum_k = np.expm1(np.log1p(k).sum())
         diff_cum = cum_k - cum_b
 
         # 추적 오차 (Tracking Error, 연율화)
         # 일간 데이터 기준 계산
         window_days = int(window_months * 21) # 영업일 대략 환산
-        if len(bm_ret) >= window_days:
-            diff_daily = kr_ret.iloc[-window_days:] - bm_ret.iloc[-window_days:]
-            te = diff_daily.std() * np.sqrt(252) * 100 # % 단위
+        if len(diff_all) >= window_days:
+            te = diff_all[-window_days:].std(ddof=1) * np.sqrt(252) * 100 # % 단위
         else:
             te = np.nan
-            
+
         return corr, diff_cum * 100, te
 
     res = {
@@ -189,15 +274,14 @@ def save_excel(results):
         c.alignment = center_align
         c.border = border
 
-    # 데이터 입력
-    for i, r in enumerate(results, 2):
-        row_vals = [
-            r["Ticker"], r["KR_Name"], r["KR_Code"], r["Type"],
-            r["Corr_12M"], r["Corr_24M"], r["Corr_36M"],
-            r["TE_12M"], r["TE_24M"], r["TE_36M"],
-            r["Diff_12M"], r["Data_Days"]
-        ]
-
+    # 데이터 입력 (결과 dict 목록을 헤더 순서의 DataFrame으로 한 번에 변환 후 행 튜플로 순회)
+    res_df = pd.DataFrame(results)[[
+        "Ticker", "KR_Name", "KR_Code", "Type",
+        "Corr_12M", "Corr_24M", "Corr_36M",
+        "TE_12M", "TE_24M", "TE_36M",
+        "Diff_12M", "Data_Days"
+    ]]
+    for i, row_vals in enumerate(res_df.itertuples(index=False, name=None), 2):
         for col, val in enumerate(row_vals, 1):
             c = ws.cell(row=i, column=col, value=val)
             c.border = border
@@ -231,11 +315,13 @@ if __name__ == "__main__":
     if fx_data.empty:
         print("❌ 환율 데이터를 가져올 수 없어 종료합니다.")
     else:
-        results = []
-        for us_ticker, info in ASSET_PAIRS.items():
-            res = analyze_pair(us_ticker, info, fx_data)
-            if res:
-                results.append(res)
+        # 미국 티커는 요청 한 번으로 미리 받아 캐시 (국내 ETF는 아래 분석 단계에서 FDR로 동시 조회)
+        prefetch_us_close(list(ASSET_PAIRS))
+
+        # 자산쌍별 분석(데이터 다운로드 포함)은 서로 독립이므로 스레드풀로 동시 실행 (결과는 원래 순서 유지)
+        with ThreadPoolExecutor(max_workers=len(ASSET_PAIRS)) as ex:
+            futures = [ex.submit(analyze_pair, us_ticker, info, fx_data) for us_ticker, info in ASSET_PAIRS.items()]
+            results = [res for res in (f.result() for f in futures) if res]
         
         if results:
             save_excel(results)
@@ -7,13 +7,17 @@
 # -----------------------------------------------------------------------------
 
 import os
-from datetime import datetime
+import math
+from datetime import date, datetime
+from pathlib import Path
 import numpy as np
 import pandas as pd
 import yfinance as yf
+from curl_cffi import requests as curl_requests
 
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 
 # =========================
@@ -22,6 +26,12 @@ from openpyxl.utils import get_column_letter
 OUT_DIR = "dual_momentum_isa"
 os.makedirs(OUT_DIR, exist_ok=True)
 
+# 당일 한정 다운로드 캐시 (parquet, 일봉 종가만 보관)
+CACHE_DIR = Path(OUT_DIR) / ".yf_cache"
+
+# 야후 요청이 연결(TCP/TLS)을 재사용하도록 세션 하나를 공유 (yfinance는 curl_cffi 세션만 받음)
+YF_SESSION = curl_requests.Session(impersonate="chrome")
+
 # 1) 의사결정용 티커 (야후 파이낸스 기준)
 # - 미국 대표: SPY (데이터 역사가 길어서 판단용으로 적합)
 # - 현금/채권: BIL (초단기채, 수비 기준)
@@ -51,29 +61,61 @@ ALLOCATION_MAP = {
 # =========================
 # 2. 데이터 유틸리티
 # =========================
-def get_monthly_close(ticker, start="2015-01-01"):
-    """야후 파이낸스에서 월말 수정종가(Adj Close) 가져오기"""
-    try:
-        df = yf.download(ticker, start=start, progress=False, auto_adjust=True)
-        if df.empty:
-            return pd.Series(dtype=float)
-        
-        # 'Close' 컬럼 추출 (MultiIndex 처리)
-        if isinstance(df.columns, pd.MultiIndex):
-            # yfinance 최신 버전 대응
-            try:
-                s = df["Close"][ticker]
-            except KeyError:
-                s = df.iloc[:, 0] # 첫번째 컬럼 강제 선택
+def ensure_series(x):
+    """Close 등에서 뽑은 뒤에도 가끔 DataFrame이 남는 케이스 방지: 1열 Series 강제."""
+    if isinstance(x, pd.DataFrame):
+        return x.iloc[:, 0].astype(float)
+    return x.astype(float)
+
+def cached_batch_close(tickers, start):
+    """
+    여러 티커 일봉 종가를 (ticker, start) 단위 parquet로 캐시.
+    - 오늘 만든 캐시가 있는 티커는 디스크에서 읽고, 나머지는 yf.download 한 번으로 묶어서 받음
+    - 받은 데이터가 없는 티커는 빈 Series
+    """
+    out, missing = {}, []
+    for t in tickers:
+        p = CACHE_DIR / f"{t}_{start}.parquet"
+        if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+            out[t] = pd.read_parquet(p, engine="pyarrow")["Close"]
         else:
-            s = df["Close"]
-            
-        # 월말 리샘플링
-        monthly = s.resample("M").last().dropna()
-        return monthly
+            missing.append(t)
+    if not missing:
+        return out
+
+    raw = yf.download(missing, start=start, progress=False, auto_adjust=True,
+                      group_by="ticker", session=YF_SESSION)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for t in missing:
+        if raw is None or raw.empty or t not in raw.columns.get_level_values(0):
+            out[t] = pd.Series(dtype=float)
+            continue
+        # 미국/한국 티커를 묶어 받으면 인덱스가 합쳐지므로 해당 티커에 값이 없는 날은 제거
+        s = ensure_series(raw[t]["Close"]).dropna()
+        if not s.empty:
+            s.to_frame("Close").to_parquet(CACHE_DIR / f"{t}_{start}.parquet", engine="pyarrow")
+        out[t] = s
+    return out
+
+def get_monthly_closes(tickers, start="2015-01-01"):
+    """야후 파이낸스에서 여러 티커의 월말 수정종가(Adj Close)를 한 번에 가져오기 → {티커: Series}"""
+    try:
+        closes = cached_batch_close(tickers, start)
     except Exception as e:
-        print(f"Error fetching {ticker}: {e}")
-        return pd.Series(dtype=float)
+        print(f"Error fetching {tickers}: {e}")
+        closes = {}
+
+    out = {}
+    for t in tickers:
+        s = closes.get(t)
+        if s is None or s.empty:
+            out[t] = pd.Series(dtype=float)
+            continue
+        # 월말 값: resample 대신 월(period) groupby, 라벨은 해당 월 말일
+        m = s.groupby(s.index.to_period("M")).last().dropna()
+        m.index = m.index.to_timestamp(how="end").normalize()
+        out[t] = m
+    return out
 
 def calc_12m_return(monthly_series):
     """최근 12개월 수익률 계산 (현재 월말 / 12개월 전 월말 - 1)"""
@@ -89,11 +131,12 @@ def calc_12m_return(monthly_series):
 def run_dual_momentum_alt3():
     print(">>> 데이터 수집 중...")
     
-    # 1) 데이터 가져오기
-    m_spy = get_monthly_close(TICKER_DECISION["US"])
-    m_bil = get_monthly_close(TICKER_DECISION["CASH"])
-    m_eu  = get_monthly_close(TICKER_DECISION["EU_ETF"])
-    m_jp  = get_monthly_close(TICKER_DECISION["JP_ETF"])
+    # 1) 데이터 가져오기 (4개 티커를 요청 한 번으로)
+    monthly = get_monthly_closes(list(TICKER_DECISION.values()))
+    m_spy = monthly[TICKER_DECISION["US"]]
+    m_bil = monthly[TICKER_DECISION["CASH"]]
+    m_eu  = monthly[TICKER_DECISION["EU_ETF"]]
+    m_jp  = monthly[TICKER_DECISION["JP_ETF"]]
 
     # 2) '합성 선진국 지수' 만들기 (유로50 + 니케이225 반반)
     # - 날짜 인덱스 맞추기 (교집합)
@@ -170,36 +213,66 @@ def run_dual_momentum_alt3():
 # =========================
 # 4. 엑셀 리포트 생성
 # =========================
+# 스타일은 저장할 때마다 새로 만들지 않도록 모듈 상수로 한 번만 생성 (색상은 8자리 ARGB)
+_TITLE_FONT = Font(size=14, bold=True, color="FFFFFFFF")
+_TITLE_FILL = PatternFill("solid", fgColor="FF4472C4")  # 파란색 헤더
+_HEADER_FILL = PatternFill("solid", fgColor="FFD9E1F2")
+_PICK_FILL = PatternFill("solid", fgColor="FFFFF2CC")   # 노란색 강조
+_BOLD = Font(bold=True)
+_SECTION_FONT = Font(bold=True, size=12)
+_WINNER_FONT = Font(bold=True, color="FFFF0000")
+_CENTER = Alignment(horizontal="center", vertical="center")
+_THIN = Side(style="thin")
+_BORDER_THIN = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+
 def save_report_to_excel(res_data):
     month_str = datetime.now().strftime("%Y-%m")
     filename = f"DualMomentum_ISA_Alt3_{month_str}.xlsx"
     filepath = os.path.join(OUT_DIR, filename)
 
-    wb = Workbook()
+    # write-only 워크북: 셀을 격자에 보관하지 않고 행 단위로 바로 기록
+    wb = Workbook(write_only=True)
     
-    # 스타일 정의
-    title_font = Font(size=14, bold=True, color="FFFFFF")
-    title_fill = PatternFill("solid", fgColor="4472C4") # 파란색 헤더
-    header_fill = PatternFill("solid", fgColor="D9E1F2")
-    center_align = Alignment(horizontal="center", vertical="center")
-    border_thin = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                         top=Side(style='thin'), bottom=Side(style='thin'))
+    # 표 셀 서식은 NamedStyle로 한 번 등록해 셀마다 이름으로만 지정 (테두리 / 테두리+퍼센트)
+    wb.add_named_style(NamedStyle(name="bordered", border=_BORDER_THIN))
+    wb.add_named_style(NamedStyle(name="bordered_pct", border=_BORDER_THIN, number_format="0.00%"))
 
     # --- Sheet 1: 투자 리포트 ---
-    ws = wb.active
-    ws.title = "ISA 투자지시서"
+    ws = wb.create_sheet("ISA 투자지시서")
+
+    # write-only 시트는 기록 후 되돌아갈 수 없으므로 컬럼 너비/병합은 행 기록 전에 지정
+    for col, width in zip("ABCDE", (15, 35, 20, 20, 30)):
+        ws.column_dimensions[col].width = width
+    ws.merged_cells.add("A1:E1")
+
+    def cell(v, style="bordered"):
+        c = WriteOnlyCell(ws, value=v)
+        if style: c.style = style
+        return c
+
+    def header_row(headers):
+        row = []
+        for h in headers:
+            c = cell(h)
+            c.fill = _HEADER_FILL
+            c.font = _BOLD
+            c.alignment = _CENTER
+            row.append(c)
+        ws.append(row)
     
     # 1. 제목
-    ws.merge_cells("A1:E1")
-    ws["A1"] = f"ISA 듀얼모멘텀 (대안3: 완전일치형) - {month_str}"
-    ws["A1"].font = title_font
-    ws["A1"].fill = title_fill
-    ws["A1"].alignment = center_align
+    c = cell(f"ISA 듀얼모멘텀 (대안3: 완전일치형) - {month_str}", style=None)
+    c.font = _TITLE_FONT
+    c.fill = _TITLE_FILL
+    c.alignment = _CENTER
+    ws.append([c])
+    ws.append([])
     
     # 2. 이번 달 결정
-    ws["A3"] = "결정 내역"
-    ws["A3"].font = Font(bold=True)
-    ws["B3"] = res_data["reason"]
+    c = cell("결정 내역", style=None)
+    c.font = _BOLD
+    ws.append([c, res_data["reason"]])
+    ws.append([])
     
     # 3. 모멘텀 비교표
     headers = ["자산군", "티커(Data)", "12개월 수익률", "비고"]
@@ -210,58 +283,33 @@ def save_report_to_excel(res_data):
     ]
     
     # 표 헤더
-    for col, h in enumerate(headers, 1):
-        c = ws.cell(row=5, column=col, value=h)
-        c.fill = header_fill
-        c.font = Font(bold=True)
-        c.alignment = center_align
-        c.border = border_thin
+    header_row(headers)
 
-    # 표 내용
-    for i, row in enumerate(data_rows, 6):
-        ws.cell(row=i, column=1, value=row[0]).border = border_thin
-        ws.cell(row=i, column=2, value=row[1]).border = border_thin
-        ws.cell(row=i, column=3, value=row[2]).number_format = '0.00%'
-        ws.cell(row=i, column=3).border = border_thin
-        ws.cell(row=i, column=4, value=row[3]).border = border_thin
+    # 표 내용 (승자 값은 루프 밖에서 한 번만 계산)
+    winner = max(res_data["mom_spy"], res_data["mom_composite"], res_data["mom_bil"])
+    for row in data_rows:
+        c_ret = cell(row[2], style="bordered_pct")
         
         # 승자 강조 (Bold + Color)
-        val = row[2]
-        if val == max(res_data["mom_spy"], res_data["mom_composite"], res_data["mom_bil"]):
-             ws.cell(row=i, column=3).font = Font(bold=True, color="FF0000")
+        if math.isclose(row[2], winner):
+             c_ret.font = _WINNER_FONT
+        ws.append([cell(row[0]), cell(row[1]), c_ret, cell(row[3])])
 
     # 4. 실제 매수 포트폴리오 (Allocation)
-    ws["A9"] = "📢 이번 달 매수 종목 (ISA 계좌)"
-    ws["A9"].font = Font(bold=True, size=12)
+    c = cell("📢 이번 달 매수 종목 (ISA 계좌)", style=None)
+    c.font = _SECTION_FONT
+    ws.append([c])
     
     alloc_headers = ["구분", "종목명", "종목코드", "투자비중"]
-    for col, h in enumerate(alloc_headers, 1):
-        c = ws.cell(row=10, column=col, value=h)
-        c.fill = header_fill
-        c.font = Font(bold=True)
-        c.alignment = center_align
-        c.border = border_thin
+    header_row(alloc_headers)
         
     target_portfolio = ALLOCATION_MAP[res_data["final_choice"]]
     
-    start_row = 11
     for item in target_portfolio:
-        ws.cell(row=start_row, column=1, value=item["지역"]).border = border_thin
-        ws.cell(row=start_row, column=2, value=item["종목명"]).border = border_thin
-        ws.cell(row=start_row, column=3, value=item["Code"]).border = border_thin
-        
-        c_weight = ws.cell(row=start_row, column=4, value=item["비중"])
+        c_weight = cell(item["비중"])
         c_weight.number_format = '0%'
-        c_weight.border = border_thin
-        c_weight.fill = PatternFill("solid", fgColor="FFF2CC") # 노란색 강조
-        start_row += 1
-
-    # 컬럼 너비 조정
-    ws.column_dimensions["A"].width = 15
-    ws.column_dimensions["B"].width = 35
-    ws.column_dimensions["C"].width = 20
-    ws.column_dimensions["D"].width = 20
-    ws.column_dimensions["E"].width = 30
+        c_weight.fill = _PICK_FILL
+        ws.append([cell(item["지역"]), cell(item["종목명"]), cell(item["Code"]), c_weight])
 
     wb.save(filepath)
     print(f"✅ 리포트 생성 완료: {filepath}")
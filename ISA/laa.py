@@ -1,19 +1,27 @@
 # laa_strategy_report.py
 # -*- coding: utf-8 -*-
 import os
-from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime
+from pathlib import Path
 import numpy as np
 import pandas as pd
 import yfinance as yf
 from pandas_datareader import data as pdr
 
 from openpyxl import Workbook
+from openpyxl.cell import Cell, WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 
 OUT_DIR = "laa_out"
 os.makedirs(OUT_DIR, exist_ok=True)
 
+# 다운로드 캐시 (parquet). 일봉은 당일 한정, UNRATE는 월 1회 발표라 일주일까지 재사용
+CACHE_DIR = Path(OUT_DIR) / ".cache"
+UNRATE_CACHE_DAYS = 7
+
 # =========================
 # 설정
 # =========================
@@ -27,24 +35,57 @@ FIXED_ASSETS = [
 ]
 TIMING_PAIR = ("QQQ", "SHY")  # (위험자산, 안전자산)
 TIMING_WEIGHT = 0.25
+SHOW_MONTHS = 120           # 엑셀에 표시할 최근 월 수 (신호도 이 구간만 계산)
+SMA_DAYS = 200
+FETCH_TIMEOUT = 30          # 동시 다운로드 대기 한도(초, 제출 시점부터)
+
+# 신호 프레임 열 이름 (SMA 열은 SMA_DAYS에서 한 번만 만들어 계산/엑셀 양쪽에서 공유)
+SPX_COL = "SPX_Close"
+SMA_COL = f"SPX_{SMA_DAYS}D_SMA"
+UR_COL = "UNRATE(%)"
+UR_MA_COL = "UNRATE_12M(%)"
 
 # =========================
 # 데이터 로딩
 # =========================
+def _cache_path(key: str, start: str) -> Path:
+    return CACHE_DIR / f"{key.replace('^', '_')}_{start}.parquet"
+
+def _read_cache(p: Path, max_age_days=0):
+    """mtime 기준 max_age_days일 이내에 만든 캐시면 DataFrame, 아니면 None (0이면 오늘 만든 것만)."""
+    if p.exists() and (date.today() - date.fromtimestamp(p.stat().st_mtime)).days <= max_age_days:
+        return pd.read_parquet(p, engine="pyarrow")
+    return None
+
+def _write_cache(p: Path, df: pd.DataFrame):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(p, engine="pyarrow")
+
 def load_daily_close(ticker: str, start=START_DATE) -> pd.Series:
-    # auto_adjust를 명시적으로 False로 지정해 경고 제거
-    df = yf.download(ticker, start=start, progress=False, auto_adjust=False)
+    p = _cache_path(ticker, start)
+    cached = _read_cache(p)
+    if cached is not None:
+        s = cached["Close"]
+        s.name = ticker
+        return s
+
+    # auto_adjust=True: 수정주가가 Close 한 열로만 옴 (Adj Close 중복 열 없음)
+    # multi_level_index=False: 단일 티커도 (Price, Ticker) 2단 컬럼 없이 받아 Close가 바로 Series
+    df = yf.download(ticker, start=start, progress=False, auto_adjust=True, multi_level_index=False)
     if df.empty or "Close" not in df:
         raise RuntimeError(f"{ticker} 데이터를 불러오지 못했습니다.")
-    s = df["Close"]
-    if isinstance(s, pd.DataFrame):
-        s = s.iloc[:, 0]
-    s = s.dropna()
+    s = df["Close"].dropna()
+    _write_cache(p, s.to_frame("Close"))
     s.name = ticker
     return s
 
 def load_unrate(start=START_DATE) -> pd.Series:
     """FRED UNRATE(%) 월간 → 반드시 1D Series로 정규화"""
+    p = _cache_path(UNRATE_SER, start)
+    cached = _read_cache(p, max_age_days=UNRATE_CACHE_DAYS)
+    if cached is not None:
+        return cached[UR_COL]
+
     df = pdr.DataReader(UNRATE_SER, "fred", start=start)
     if df is None or df.empty:
         raise RuntimeError("UNRATE 데이터를 불러오지 못했습니다.")
@@ -53,63 +94,62 @@ def load_unrate(start=START_DATE) -> pd.Series:
     if isinstance(s, pd.DataFrame):
         s = s.iloc[:, 0]
     s = s.dropna()
-    s.name = "UNRATE(%)"
+    s.name = UR_COL
+    _write_cache(p, s.to_frame())
     return s
 
 # =========================
 # 신호 계산
 # =========================
 def compute_signals():
+    # 0) 야후(S&P500)와 FRED(UNRATE) 다운로드는 서로 독립이므로 동시에 받음
+    #    with 블록은 빠져나올 때 작업 종료까지 기다리므로, 제출 시점부터 FETCH_TIMEOUT만 기다리고 넘으면 중단
+    ex = ThreadPoolExecutor(max_workers=2)
+    f_spx = ex.submit(load_daily_close, SPX_TICKER)
+    f_ur = ex.submit(load_unrate)
+    _, not_done = wait([f_spx, f_ur], timeout=FETCH_TIMEOUT)
+    ex.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        raise TimeoutError(f"데이터 다운로드가 {FETCH_TIMEOUT}초 안에 끝나지 않았습니다.")
+    spx = f_spx.result()
+    ur = f_ur.result()
+
     # 1) S&P500 일별 종가 + 200거래일 SMA
-    spx = load_daily_close(SPX_TICKER)
-    spx_sma200 = spx.rolling(window=200, min_periods=200).mean()
+    #    - 표시 구간(+여유 5개월) 앞으로 SMA 계산에 필요한 199거래일만 남기고 잘라서 rolling 길이를 줄임
+    #      (구간 안의 SMA/월말 값은 전체 기간으로 계산한 것과 동일)
+    cut = spx.index.searchsorted(spx.index[-1] - pd.DateOffset(months=SHOW_MONTHS + 5))
+    spx = spx.iloc[max(0, cut - (SMA_DAYS - 1)):]
+    spx_sma200 = spx.rolling(window=SMA_DAYS, min_periods=SMA_DAYS).mean()
 
-    # 2) 월말 샘플링: 'ME' 사용 + 월(period) 정렬
+    # 2) 월말 샘플링: 월(period)별 마지막 값
     #    - 거래일 월말이 실제 달의 말일과 다를 수 있으므로 period 기준으로 정규화
-    spx_me = spx.resample("ME").last()  # month end
-    sma200_me = spx_sma200.reindex(spx.index, method="ffill").resample("ME").last()
-
-    # period(M) 인덱스로 변환
-    spx_p = spx_me.to_period("M")
-    sma200_p = sma200_me.to_period("M")
-
-    # 3) UNRATE 월간 + 12개월 이동평균 (원래 월간이므로 바로 period로 맞춤)
-    ur = load_unrate()
+    #    - 일별 인덱스는 날짜순이므로 groupby 없이 월이 바뀌기 직전 행(각 월의 마지막 거래일) 위치만 골라 배열에서 바로 꺼냄
+    #      (SMA 결측은 앞쪽 워밍업 구간뿐이라 groupby().last()와 결과 동일)
+    months = spx.index.to_period("M")
+    month_key = months.asi8
+    last_pos = np.append(np.flatnonzero(month_key[1:] != month_key[:-1]), len(month_key) - 1)
+    spx_p = pd.DataFrame({SPX_COL: spx.to_numpy()[last_pos], SMA_COL: spx_sma200.to_numpy()[last_pos]},
+                         index=months[last_pos])
+
+    # 3) UNRATE 월간 + 12개월 이동평균 (원래 월간이므로 바로 period 인덱스로 프레임 생성)
     ur_12m = ur.rolling(window=12, min_periods=12).mean()
+    ur_p = pd.DataFrame({UR_COL: ur.to_numpy(), UR_MA_COL: ur_12m.to_numpy()},
+                        index=ur.index.to_period("M"))
 
-    ur_p = ur.to_period("M")
-    ur12_p = ur_12m.to_period("M")
-
-    # 4) 공통 period(M) 인덱스 교집합
-    common_p = spx_p.index.intersection(ur_p.index)
-    if len(common_p) == 0:
+    # 4) 공통 period(M) 인덱스로 inner join (지수 쪽 월 순서 유지)
+    df = spx_p.join(ur_p, how="inner")
+    if df.empty:
         raise RuntimeError("공통 월(period) 인덱스가 비었습니다. 데이터 수집 기간/네트워크를 확인하세요.")
 
-    # 5) 공통 period로 재색인 후 month-end 타임스탬프로 되돌리기
-    spx_p = spx_p.reindex(common_p)
-    sma200_p = sma200_p.reindex(common_p)
-    ur_p = ur_p.reindex(common_p)
-    ur12_p = ur12_p.reindex(common_p)
-
-    # period → 실제 달의 말일 타임스탬프
-    idx_ts = common_p.to_timestamp("M", how="end")
-
-    spx_m = pd.Series(spx_p.values, index=idx_ts, name="SPX_Close")
-    sma200_m = pd.Series(sma200_p.values, index=idx_ts, name="SPX_200D_SMA")
-    ur_m = pd.Series(ur_p.values, index=idx_ts, name="UNRATE(%)")
-    ur12_m = pd.Series(ur12_p.values, index=idx_ts, name="UNRATE_12M(%)")
+    # 5) period → 실제 달의 말일 타임스탬프 (인덱스 이름은 비워 reset_index 시 "index" 열이 되도록)
+    df.index = df.index.to_timestamp("M", how="end").rename(None)
 
-    # 6) 합치기
-    df = pd.concat([spx_m, sma200_m, ur_m, ur12_m], axis=1)
-
-    # 7) 신호 계산
-    cond_price = df["SPX_Close"] < df["SPX_200D_SMA"]
-    cond_unemp = df["UNRATE(%)"] > df["UNRATE_12M(%)"]
+    # 6) 초기 결측 제거 후 신호 계산 (열을 NumPy 배열로 꺼내 비교/AND 한 번, np.where 한 번)
+    df = df.dropna(subset=[SPX_COL, SMA_COL, UR_COL, UR_MA_COL])
+    cond_price = df[SPX_COL].to_numpy() < df[SMA_COL].to_numpy()
+    cond_unemp = df[UR_COL].to_numpy() > df[UR_MA_COL].to_numpy()
     df["TimingChoice"] = np.where(cond_price & cond_unemp, "SHY", "QQQ")
 
-    # 초기 결측 제거
-    df = df.dropna(subset=["SPX_Close", "SPX_200D_SMA", "UNRATE(%)", "UNRATE_12M(%)"])
-
     return df
 
 # =========================
@@ -136,28 +176,39 @@ def current_allocation(signals_df: pd.DataFrame):
 # =========================
 # 엑셀 저장
 # =========================
-def autosize_columns(ws, max_width=60):
-    widths = {}
-    for row in ws.iter_rows(values_only=True):
-        for i, v in enumerate(row, start=1):
-            v = "" if v is None else str(v)
-            widths[i] = max(widths.get(i, 0), len(v))
+# 공통 스타일 (모듈 상수로 한 번만 생성해 모든 시트/셀이 공유, 색상은 8자리 ARGB)
+_TITLE_FILL = PatternFill("solid", fgColor="FFE6F0FF")
+_HEADER_FILL = PatternFill("solid", fgColor="FFF2F2F2")
+_THIN = Side(style="thin", color="FFD9D9D9")
+_BORDER_ALL = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_TITLE_FONT = Font(size=14, bold=True)
+_BOLD = Font(bold=True)
+_TITLE_ALIGN = Alignment(horizontal="center", vertical="center")
+_CENTER = Alignment(horizontal="center")
+
+def track_widths(widths, row):
+    """행을 만들 때 열별 최대 글자 수를 바로 갱신 (기록 후 시트를 다시 훑지 않음)."""
+    for i, v in enumerate(row, start=1):
+        if isinstance(v, Cell):
+            v = v.value
+        n = 0 if v is None else len(str(v))  # 빈 칸(병합 제목 등)도 열로 등록되어 최소 너비 적용
+        if n > widths[i]:
+            widths[i] = n
+    return row
+
+def write_rows(ws, rows, widths, max_width=60):
+    """write-only 시트는 기록 후 되돌아갈 수 없으므로 열 너비를 먼저 지정한 뒤 행을 스트리밍 기록."""
     for i, w in widths.items():
         ws.column_dimensions[get_column_letter(i)].width = min(max(w + 2, 12), max_width)
+    for row in rows:
+        ws.append(row)
 
 def build_excel(signals_df: pd.DataFrame, alloc_df: pd.DataFrame, last_date, timing_choice):
     month_str = datetime.now().strftime("%Y-%m")
     xlsx_path = os.path.join(OUT_DIR, f"laa_report_{month_str}.xlsx")
 
-    wb = Workbook()
-    # 기본 시트 제거
-    wb.remove(wb.active)
-
-    # 공통 스타일
-    title_fill = PatternFill("solid", fgColor="E6F0FF")
-    header_fill = PatternFill("solid", fgColor="F2F2F2")
-    thin = Side(style="thin", color="D9D9D9")
-    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
+    # write-only 모드: 셀을 메모리에 격자로 들고 있지 않고 행 단위로 스트리밍 기록
+    wb = Workbook(write_only=True)
 
     # Named styles
     if "percent_style" not in wb.named_styles:
@@ -165,120 +216,122 @@ def build_excel(signals_df: pd.DataFrame, alloc_df: pd.DataFrame, last_date, tim
     if "number_style" not in wb.named_styles:
         st = NamedStyle(name="number_style"); st.number_format = "#,##0.00"; wb.add_named_style(st)
 
+    def cell(ws, v, style=None):
+        c = WriteOnlyCell(ws, value=v)
+        c.border = _BORDER_ALL
+        if style: c.style = style  # NamedStyle 지정 시 테두리는 초기화됨 (기존 출력과 동일)
+        return c
+
+    def title_row(ws, span, text):
+        c = WriteOnlyCell(ws, value=text)
+        c.font = _TITLE_FONT; c.fill = _TITLE_FILL
+        c.alignment = _TITLE_ALIGN
+        ws.merged_cells.add(f"A1:{get_column_letter(span)}1")
+        ws.row_dimensions[1].height = 24
+        return [c] + [None] * (span - 1)
+
+    def header_row(ws, columns):
+        row = []
+        for h in columns:
+            c = WriteOnlyCell(ws, value=h)
+            c.font = _BOLD; c.fill = _HEADER_FILL
+            c.border = _BORDER_ALL; c.alignment = _CENTER
+            row.append(c)
+        return row
+
     # ===== Sheet 1: Summary (현재 목표 배분) =====
     ws1 = wb.create_sheet("Summary")
-    ws1.merge_cells(start_row=1, start_column=1, end_row=1, end_column=6)
-    c = ws1.cell(row=1, column=1, value=f"LAA Summary — {month_str}")
-    c.font = Font(size=14, bold=True); c.fill = title_fill
-    c.alignment = Alignment(horizontal="center", vertical="center")
-    ws1.row_dimensions[1].height = 24
+    w1 = defaultdict(int)
+    rows = []
+    def add1(row): rows.append(track_widths(w1, row))
+    add1(title_row(ws1, 6, f"LAA Summary — {month_str}"))
+    add1([])
 
     # 배너
     banner = f"현재 타이밍 자산: {timing_choice}  |  기준일: {last_date.date()}"
-    ws1.cell(row=3, column=1, value=banner).font = Font(bold=True)
+    b = WriteOnlyCell(ws1, value=banner); b.font = _BOLD
+    add1([b])
+    add1([])
 
     # 표 헤더
     headers = ["자산군", "티커", "목표비중(%)", "비고"]
-    for col, h in enumerate(headers, start=1):
-        cell = ws1.cell(row=5, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
+    add1(header_row(ws1, headers))
 
     # 데이터
-    r = 6
-    for _, row in alloc_df.iterrows():
-        ws1.cell(row=r, column=1, value=row["자산군"]).border = border_all
-        ws1.cell(row=r, column=2, value=row["티커"]).border = border_all
-        c3 = ws1.cell(row=r, column=3, value=float(row["목표비중(%)"]) / 100.0)
-        c3.border = border_all; c3.style = "percent_style"
-        ws1.cell(row=r, column=4, value="" if row["자산군"] != "타이밍 자산" else "월 1회 리밸런싱").border = border_all
-        r += 1
+    for group, ticker, weight in alloc_df[["자산군", "티커", "목표비중(%)"]].itertuples(index=False, name=None):
+        add1([
+            cell(ws1, group),
+            cell(ws1, ticker),
+            cell(ws1, float(weight) / 100.0, "percent_style"),
+            cell(ws1, "" if group != "타이밍 자산" else "월 1회 리밸런싱"),
+        ])
 
     ws1.freeze_panes = "A6"
-    autosize_columns(ws1, max_width=40)
+    write_rows(ws1, rows, w1, max_width=40)
 
     # ===== Sheet 2: Signals (월말 S&P/200D, 실업률/12M, 타이밍) =====
     ws2 = wb.create_sheet("Signals")
+    w2 = defaultdict(int)
+    rows = []
+    def add2(row): rows.append(track_widths(w2, row))
 
-    ws2.merge_cells(start_row=1, start_column=1, end_row=1, end_column=10)
-    c2 = ws2.cell(row=1, column=1, value=f"Signals — 월말 기준 (S&P500 vs 200D, 실업률 vs 12M, 타이밍) — {month_str}")
-    c2.font = Font(size=14, bold=True); c2.fill = title_fill
-    c2.alignment = Alignment(horizontal="center", vertical="center")
-    ws2.row_dimensions[1].height = 24
+    add2(title_row(ws2, 10, f"Signals — 월말 기준 (S&P500 vs 200D, 실업률 vs 12M, 타이밍) — {month_str}"))
+    add2([])
 
-    # 보기 좋게 최근 120개월만 표시 (필요시 변경)
-    sig = signals_df.copy()
-    if len(sig) > 120:
-        sig = sig.iloc[-120:].copy()
+    # 보기 좋게 최근 SHOW_MONTHS개월만 표시 (필요시 변경). 읽기만 하므로 복사 없이 뒤쪽 슬라이스 사용
+    sig = signals_df.iloc[-SHOW_MONTHS:]
 
     sig_out = sig.reset_index().rename(columns={
         "index": "월말",
-        "SPX_Close": "미국 S&P 500 지수 가격",
-        "SPX_200D_SMA": "200일 이동평균 가격",
-        "UNRATE(%)": "미국 실업률(%)",
-        "UNRATE_12M(%)": "12개월 이동평균(%)",
+        SPX_COL: "미국 S&P 500 지수 가격",
+        SMA_COL: f"{SMA_DAYS}일 이동평균 가격",
+        UR_COL: "미국 실업률(%)",
+        UR_MA_COL: "12개월 이동평균(%)",
         "TimingChoice": "타이밍 선택(월말)"
     })
 
     # 헤더
-    for col, h in enumerate(sig_out.columns, start=1):
-        cell = ws2.cell(row=3, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
-
-    # 데이터 + 서식
-    r = 4
-    for _, row in sig_out.iterrows():
-        ws2.cell(row=r, column=1, value=row["월말"].date()).border = border_all
-
-        cpx = ws2.cell(row=r, column=2, value=float(row["미국 S&P 500 지수 가격"]))
-        cpx.border = border_all; cpx.style = "number_style"
-
-        csma = ws2.cell(row=r, column=3, value=float(row["200일 이동평균 가격"]))
-        csma.border = border_all; csma.style = "number_style"
-
-        # 실업률은 백분율 → 엑셀 퍼센트 서식 적용
-        u = row["미국 실업률(%)"]
-        u12 = row["12개월 이동평균(%)"]
-        cu = ws2.cell(row=r, column=4, value=None if pd.isna(u) else float(u) / 100.0)
-        cu.border = border_all; cu.style = "percent_style"
-        cu12 = ws2.cell(row=r, column=5, value=None if pd.isna(u12) else float(u12) / 100.0)
-        cu12.border = border_all; cu12.style = "percent_style"
-
-        ws2.cell(row=r, column=6, value=row["타이밍 선택(월말)"]).border = border_all
-
-        r += 1
+    add2(header_row(ws2, sig_out.columns))
+
+    # 데이터 + 서식: 열 단위로 값을 한 번에 변환한 뒤 행으로 묶어 기록
+    #   (실업률은 백분율 → 엑셀 퍼센트 서식, 결측은 빈 셀)
+    def pct_col(col):
+        return [None if pd.isna(v) else v for v in (sig_out[col].astype(float) / 100.0).tolist()]
+
+    columns = (
+        [d.date() for d in sig_out["월말"]],
+        sig_out["미국 S&P 500 지수 가격"].astype(float).tolist(),
+        sig_out[f"{SMA_DAYS}일 이동평균 가격"].astype(float).tolist(),
+        pct_col("미국 실업률(%)"),
+        pct_col("12개월 이동평균(%)"),
+        sig_out["타이밍 선택(월말)"].tolist(),
+    )
+    styles = (None, "number_style", "number_style", "percent_style", "percent_style", None)
+    for values in zip(*columns):
+        add2([cell(ws2, v, st) for v, st in zip(values, styles)])
 
     ws2.freeze_panes = "A4"
-    autosize_columns(ws2, max_width=52)
+    write_rows(ws2, rows, w2, max_width=52)
 
     # ===== Sheet 3: TimingOnly (월말 타이밍만 모아서) =====
     ws3 = wb.create_sheet("TimingOnly")
-    ws3.merge_cells(start_row=1, start_column=1, end_row=1, end_column=4)
-    c3 = ws3.cell(row=1, column=1, value=f"Timing Choice History — {month_str}")
-    c3.font = Font(size=14, bold=True); c3.fill = title_fill
-    c3.alignment = Alignment(horizontal="center", vertical="center")
-    ws3.row_dimensions[1].height = 24
-
-    # 최근 120개월만
-    t_only = signals_df[["TimingChoice"]].copy()
-    if len(t_only) > 120:
-        t_only = t_only.iloc[-120:].copy()
+    w3 = defaultdict(int)
+    rows = []
+    def add3(row): rows.append(track_widths(w3, row))
+    add3(title_row(ws3, 4, f"Timing Choice History — {month_str}"))
+    add3([])
+
+    # 최근 SHOW_MONTHS개월만
+    t_only = signals_df[["TimingChoice"]].iloc[-SHOW_MONTHS:]
     t_only = t_only.reset_index().rename(columns={"index": "월말", "TimingChoice": "타이밍 선택(월말)"})
 
-    for col, h in enumerate(t_only.columns, start=1):
-        cell = ws3.cell(row=3, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center")
+    add3(header_row(ws3, t_only.columns))
 
-    r = 4
-    for _, row in t_only.iterrows():
-        ws3.cell(row=r, column=1, value=row["월말"].date()).border = border_all
-        ws3.cell(row=r, column=2, value=row["타이밍 선택(월말)"]).border = border_all
-        r += 1
+    for month_end, choice in t_only.itertuples(index=False, name=None):
+        add3([cell(ws3, month_end.date()), cell(ws3, choice)])
 
     ws3.freeze_panes = "A4"
-    autosize_columns(ws3, max_width=32)
+    write_rows(ws3, rows, w3, max_width=32)
 
     # 저장
     wb.save(xlsx_path)
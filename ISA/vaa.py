@@ -3,12 +3,24 @@
 # VAA 전략: EFA 대신 [유로스탁스50 + 일본니케이225] 합성 지수 사용 버전
 
 import os
-from datetime import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
 import pandas as pd
 import numpy as np
 import FinanceDataReader as fdr
 
+try:
+    from numba import njit
+except ImportError:  # numba 미설치 시 순수 파이썬(NumPy)으로 동일하게 동작
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
 from openpyxl import Workbook
+from openpyxl.cell import Cell, WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 
@@ -17,9 +29,17 @@ from openpyxl.utils import get_column_letter
 # =========================================================
 CONVERT_TO_KRW = True   # 미국 ETF 가격을 원화로 환산해 표기 (단, 국내 ETF 합성은 제외)
 MIN_MONTHS = 13         # 12개월 비교(현재 포함)에 필요한 최소 월 스냅샷 수
+SNAPSHOT_POS = [-1, -2, -4, -7, -13]  # 월말 시리즈에서 현재/1/3/6/12개월 전 위치
 
 OUT_DIR = "vaa_out"
 
+# 당일 한정 다운로드 캐시 (parquet)
+CACHE_DIR = Path(OUT_DIR) / ".fdr_cache"
+
+# 환율은 스크립트(vaa, vaa_test)끼리 공유하는 캐시에 가장 이른 시작일부터 받아 두고 필요한 구간만 잘라 씀
+FX_CACHE_DIR = Path(".fx_cache")
+FX_HISTORY_START = "2010-01-01"
+
 # =========================================================
 # 의사결정 자산 구성 (EFA -> COMPOSITE_EU_JP 변경)
 # =========================================================
@@ -60,6 +80,43 @@ PROXY_MAP = {
     "SHY": ["BIL", "SHV"],
 }
 
+# =========================================================
+# 다운로드 캐시
+# =========================================================
+def cached_reader(ticker: str, start="2010-01-01") -> pd.DataFrame:
+    """
+    fdr.DataReader(ticker, start) 결과를 (ticker, start) 단위 parquet로 캐시 (Close/Volume만 보관).
+    - 캐시 파일 수정일이 오늘이면 디스크에서 읽고, 아니면 새로 받아 덮어씀
+    """
+    p = CACHE_DIR / f"{ticker.replace('/', '-')}_{start}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        return pd.read_parquet(p, engine="pyarrow")
+    df = fdr.DataReader(ticker, start)
+    if df is None or df.empty:
+        return df
+    df = df[[c for c in ("Close", "Volume") if c in df.columns]]
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(p, engine="pyarrow")
+    return df
+
+def read_fx_daily(sym: str, start="2010-01-01") -> pd.DataFrame:
+    """
+    환율 일봉(Close)을 실행 위치의 공용 parquet 캐시(FX_CACHE_DIR)로 vaa/vaa_test가 함께 사용.
+    - 캐시 파일 수정일이 오늘이면 디스크에서 읽고, 아니면 FX_HISTORY_START부터 새로 받아 덮어씀
+    - 반환은 start 이후 구간만
+    """
+    p = FX_CACHE_DIR / f"{sym.replace('/', '-')}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        df = pd.read_parquet(p, engine="pyarrow")
+    else:
+        df = fdr.DataReader(sym, FX_HISTORY_START)
+        if df is None or df.empty:
+            return df
+        df = df[["Close"]]
+        FX_CACHE_DIR.mkdir(exist_ok=True)
+        df.to_parquet(p, engine="pyarrow")
+    return df.loc[pd.Timestamp(start):]
+
 # =========================================================
 # 환율 (KRW per USD) 월말 시리즈
 # =========================================================
@@ -68,10 +125,10 @@ def _read_fx_usdkrw(start="2010-01-01") -> pd.Series:
     last_err = None
     for sym in candidates:
         try:
-            fx = fdr.DataReader(sym, start)
+            fx = read_fx_daily(sym, start)
             if not fx.empty and "Close" in fx:
                 s = fx["Close"].dropna()
-                return s.resample("M").last().dropna()
+                return s.resample("ME").last().dropna()
         except Exception as e:
             last_err = e
             continue
@@ -82,12 +139,28 @@ def _read_fx_usdkrw(start="2010-01-01") -> pd.Series:
 
 USDKRW_MONTHLY = _read_fx_usdkrw()
 
+# 환산 시 매번 reindex하지 않도록 날짜/환율을 정렬된 numpy 배열 쌍으로 보관 (fx_ffill에서 searchsorted)
+_FX_DATES = USDKRW_MONTHLY.index.values.astype("datetime64[ns]")
+_FX_RATES = USDKRW_MONTHLY.to_numpy(dtype="float64")
+
+def fx_ffill(dates_ns: np.ndarray) -> np.ndarray:
+    """각 날짜 이하의 마지막 월말 환율 (= reindex ffill). 첫 환율보다 이른 날짜는 NaN."""
+    pos = np.searchsorted(_FX_DATES, dates_ns, side="right") - 1
+    rates = _FX_RATES[np.clip(pos, 0, None)] if len(_FX_RATES) else np.full(len(pos), np.nan)
+    return np.where(pos >= 0, rates, np.nan)
+
 # =========================================================
 # 데이터 핸들링 유틸리티
 # =========================================================
+def ensure_series(x):
+    """Close 등에서 뽑은 뒤에도 가끔 DataFrame이 남는 케이스 방지: 1열 Series 강제."""
+    if isinstance(x, pd.DataFrame):
+        return x.iloc[:, 0].astype(float)
+    return x.astype(float)
+
 def load_daily(ticker: str, start="2010-01-01") -> pd.DataFrame:
     try:
-        df = fdr.DataReader(ticker, start)
+        df = cached_reader(ticker, start)
         if df is None or df.empty or "Close" not in df.columns:
             return pd.DataFrame()
         if not isinstance(df.index, pd.DatetimeIndex):
@@ -102,8 +175,8 @@ def load_composite_daily(start="2010-01-01") -> pd.DataFrame:
     print(">> 합성 지수(유로+일본) 데이터 생성 중...")
     try:
         # TIGER 유로스탁스50(195930), TIGER 일본니케이225(241180)
-        df_eu = fdr.DataReader("195930", start)
-        df_jp = fdr.DataReader("241180", start)
+        df_eu = cached_reader("195930", start)
+        df_jp = cached_reader("241180", start)
 
         if df_eu.empty or df_jp.empty:
             return pd.DataFrame()
@@ -134,69 +207,66 @@ def load_composite_daily(start="2010-01-01") -> pd.DataFrame:
         print(f"❌ 합성 지수 생성 실패: {e}")
         return pd.DataFrame()
 
-def monthly_with_current(df: pd.DataFrame, is_krw_asset: bool = False) -> pd.Series:
+def _monthly_plain(df: pd.DataFrame, is_krw_asset: bool = False) -> pd.Series:
     """
-    일봉 → 월말 종가 + 현재(오늘) 종가 보강.
-    is_krw_asset=True이면 환율 곱셈을 건너뜀 (이미 KRW).
+    일봉 → 월별 마지막 종가 (진행 중인 이번 달은 오늘 종가가 마지막 값, 라벨은 월말 날짜).
+    환율 환산 없음 (is_krw_asset은 _monthly_with_fx와 호출 형태를 맞추기 위한 인자).
     """
     if df is None or df.empty or "Close" not in df:
         return pd.Series(dtype="float64")
 
-    close = df["Close"]
-    if isinstance(close, pd.DataFrame):
-        close = close.iloc[:, 0]
-
-    monthly = close.resample("M").last().dropna()
-
-    # 현재 종가 보강
-    last_date = close.index[-1]
-    last_close = float(close.iloc[-1])
-    if len(monthly) == 0 or (monthly.index[-1].month != last_date.month or monthly.index[-1].year != last_date.year):
-        monthly = pd.concat([monthly, pd.Series([last_close], index=[last_date])])
-
-    # KRW 환산 (이미 원화자산이 아니고, 변환 옵션이 켜져있을 때만)
-    if CONVERT_TO_KRW and not is_krw_asset:
-        fx = USDKRW_MONTHLY.reindex(monthly.index, method="ffill")
-        if isinstance(fx, pd.DataFrame):
-            fx = fx.iloc[:, 0]
-        monthly = monthly.astype("float64") * fx.astype("float64")
+    close = ensure_series(df["Close"])
 
-    if isinstance(monthly, pd.DataFrame):
-        monthly = monthly.squeeze("columns")
-    return monthly.astype("float64")
+    # 월(period) 단위 groupby의 마지막 값이라 이번 달도 오늘 종가로 채워짐 → 별도 보강 분기 불필요
+    monthly = close.groupby(close.index.to_period("M")).last().dropna()
+    return pd.Series(monthly.to_numpy(dtype="float64"), index=monthly.index.to_timestamp(how="end").normalize())
 
-def snapshot_momentum(monthly: pd.Series):
+def _monthly_with_fx(df: pd.DataFrame, is_krw_asset: bool = False) -> pd.Series:
     """
-    스냅샷 모멘텀 계산
+    _monthly_plain + KRW 환산.
+    is_krw_asset=True이면 환율 곱셈을 건너뜀 (이미 KRW).
     """
-    if monthly is None or len(monthly) < MIN_MONTHS:
-        raise ValueError("월말 시리즈가 부족합니다.")
+    monthly = _monthly_plain(df)
+    if is_krw_asset:
+        return monthly
 
-    def _scalar(x):
-        try: return float(x.item())
-        except: return float(x)
+    fx = fx_ffill(monthly.index.values.astype("datetime64[ns]"))
+    return pd.Series(monthly.to_numpy() * fx, index=monthly.index)
 
-    P0  = _scalar(monthly.iloc[-1])   # 현재
-    P1  = _scalar(monthly.iloc[-2])   # 1개월 전
-    P3  = _scalar(monthly.iloc[-4])   # 3개월 전
-    P6  = _scalar(monthly.iloc[-7])   # 6개월 전
-    P12 = _scalar(monthly.iloc[-13])  # 12개월 전
+# 환산 옵션은 환율 로드 이후 바뀌지 않으므로 (로드 실패 시 꺼짐) 호출마다 분기하지 않고 한 번만 선택
+monthly_with_current = _monthly_with_fx if CONVERT_TO_KRW else _monthly_plain
 
-    r1  = P0 / P1  - 1.0
-    r3  = P0 / P3  - 1.0
-    r6  = P0 / P6  - 1.0
-    r12 = P0 / P12 - 1.0
+@functools.lru_cache(maxsize=256)
+def get_monthly_krw(ticker: str, start="2010-01-01") -> pd.Series:
+    """미국 ETF 일봉 → 월별 종가(KRW 환산) Series. 같은 실행 안에서는 (ticker, start)별로 한 번만 계산 (반환값은 수정하지 말 것)"""
+    return monthly_with_current(load_daily(ticker, start), is_krw_asset=False)
 
-    score_raw = 12*r1 + 4*r3 + 2*r6 + 1*r12
-    score_pct = score_raw # (기존 코드 로직 유지)
+MOMENTUM_WEIGHTS = (12.0, 4.0, 2.0, 1.0)  # 1/3/6/12개월 수익률 가중치
 
-    return r1, r3, r6, r12, score_pct, P0, P1, P3, P6, P12
+@njit(cache=True, error_model="numpy")
+def snapshot_momentum(P: np.ndarray):
+    """
+    스냅샷 모멘텀 계산 (티커 전체를 한 번에 도는 커널)
+    - P: (티커 수, 5) 가격 배열 [현재, 1, 3, 6, 12개월 전], 데이터 없는 티커 행은 NaN
+    - 반환: (R, score) R은 (티커 수, 4) [1, 3, 6, 12개월 수익률], score는 12*r1 + 4*r3 + 2*r6 + 1*r12
+    """
+    n = P.shape[0]
+    R = np.empty((n, 4))
+    score = np.empty(n)
+    for i in range(n):
+        acc = 0.0
+        for j in range(4):
+            R[i, j] = P[i, 0] / P[i, j + 1] - 1.0
+            acc += MOMENTUM_WEIGHTS[j] * R[i, j]  # (기존 코드 로직 유지: 비율 그대로 가중합)
+        score[i] = acc
+    return R, score
 
 def resolve_with_proxy(ticker_key: str):
     """
     티커 키에 따라 데이터를 로드.
     - COMPOSITE_EU_JP: 합성 데이터 로드 (환율 적용 X)
     - 그 외: 미국 ETF 로드 (환율 적용 O)
+    반환: (사용티커, 데이터출처, 월말 시리즈 또는 None)
     """
     # 1. 특수 케이스: 유로+일본 합성
     if ticker_key == "COMPOSITE_EU_JP":
@@ -204,211 +274,247 @@ def resolve_with_proxy(ticker_key: str):
         # 합성 지수는 이미 KRW 기반이므로 is_krw_asset=True
         monthly = monthly_with_current(df, is_krw_asset=True)
         if len(monthly) >= MIN_MONTHS:
-            return ticker_key, "합성(KRW)", *snapshot_momentum(monthly)
+            return ticker_key, "합성(KRW)", monthly
         else:
-            return ticker_key, "데이터부족", None, None, None, None, None, None, None, None, None, None
+            return ticker_key, "데이터부족", None
 
     # 2. 일반 케이스 (미국 ETF)
     # 원본 티커 시도
-    df = load_daily(ticker_key)
-    monthly = monthly_with_current(df, is_krw_asset=False)
+    monthly = get_monthly_krw(ticker_key)
     if len(monthly) >= MIN_MONTHS:
-        return ticker_key, "원본", *snapshot_momentum(monthly)
+        return ticker_key, "원본", monthly
 
     # 프록시 시도
     for p in PROXY_MAP.get(ticker_key, []):
-        dfp = load_daily(p)
-        monthly_p = monthly_with_current(dfp, is_krw_asset=False)
+        monthly_p = get_monthly_krw(p)
         if len(monthly_p) >= MIN_MONTHS:
-            return p, f"대체[{p}]", *snapshot_momentum(monthly_p)
+            return p, f"대체[{p}]", monthly_p
 
-    return ticker_key, "데이터없음", None, None, None, None, None, None, None, None, None, None
+    return ticker_key, "데이터없음", None
 
 # =========================================================
 # 계산 & 결정
 # =========================================================
 def build_summary_df():
-    rows = []
-    for _, r in DECISION_DF.iterrows():
-        group, label, us_ticker = r["분류"], r["의사결정기준"], r["US_Ticker"]
-
-        used_ticker, src, r1, r3, r6, r12, score_pct, P0, P1, P3, P6, P12 = resolve_with_proxy(us_ticker)
-
-        # 국내 투자 종목 매핑
-        kr_map = US_TO_KR_MAP.get(us_ticker, {"종목명": None, "Code": None, "환율": None})
-
-        rows.append([
-            group, label, us_ticker, used_ticker, src,
-            kr_map["종목명"], kr_map["Code"], kr_map["환율"],
-            None if r1  is None else round(r1*100,  2),
-            None if r3  is None else round(r3*100,  2),
-            None if r6  is None else round(r6*100,  2),
-            None if r12 is None else round(r12*100, 2),
-            None if score_pct is None else round(score_pct, 2),
-            P0, P1, P3, P6, P12
-        ])
-
-    return pd.DataFrame(rows, columns=[
-        "분류","의사결정기준","US_Ticker","사용티커","데이터출처",
-        "실제투자_종목명","실제투자_Code","실제투자_환율",
-        "1개월(%)","3개월(%)","6개월(%)","12개월(%)","모멘텀점수(가중합,%)",
-        "현재가격(KRW)","1개월전(KRW)","3개월전(KRW)","6개월전(KRW)","12개월전(KRW)"
-    ])
+    # 티커별 데이터 조회(네트워크 I/O)는 서로 독립이므로 스레드풀로 동시에 받아둠
+    # DECISION_DF는 스키마 참고용, 값은 원본 리스트에서 바로 꺼냄 (행 단위 Series 생성 없음)
+    groups, labels, tickers = (list(col) for col in zip(*DECISION_ASSETS))
+    with ThreadPoolExecutor(max_workers=len(tickers)) as ex:
+        resolved = list(ex.map(resolve_with_proxy, tickers))
+
+    # 스냅샷 가격을 (티커 수, 5) 배열로 쌓고 수익률/점수는 배열 연산 한 번으로 계산
+    P = np.full((len(tickers), len(SNAPSHOT_POS)), np.nan)
+    for i, (_, _, monthly) in enumerate(resolved):
+        if monthly is not None:
+            P[i] = monthly.to_numpy()[SNAPSHOT_POS]
+    R, score = snapshot_momentum(P)
+    R_pct = np.round(R * 100, 2)
+
+    # 국내 투자 종목 매핑
+    empty_map = {"종목명": None, "Code": None, "환율": None}
+    kr_maps = [US_TO_KR_MAP.get(t, empty_map) for t in tickers]
+
+    return pd.DataFrame({
+        "분류": groups,
+        "의사결정기준": labels,
+        "US_Ticker": tickers,
+        "사용티커": [used for used, _, _ in resolved],
+        "데이터출처": [src for _, src, _ in resolved],
+        "실제투자_종목명": [m["종목명"] for m in kr_maps],
+        "실제투자_Code": [m["Code"] for m in kr_maps],
+        "실제투자_환율": [m["환율"] for m in kr_maps],
+        "1개월(%)": R_pct[:, 0],
+        "3개월(%)": R_pct[:, 1],
+        "6개월(%)": R_pct[:, 2],
+        "12개월(%)": R_pct[:, 3],
+        "모멘텀점수(가중합,%)": np.round(score, 2),
+        "현재가격(KRW)": P[:, 0],
+        "1개월전(KRW)": P[:, 1],
+        "3개월전(KRW)": P[:, 2],
+        "6개월전(KRW)": P[:, 3],
+        "12개월전(KRW)": P[:, 4],
+    })
 
 def decision_banner(summary_df: pd.DataFrame) -> str:
-    aggr = summary_df[summary_df["분류"]=="공격자산"].copy()
-    safe = summary_df[summary_df["분류"]=="안전자산"].copy()
+    aggr = summary_df[summary_df["분류"]=="공격자산"]
+    safe = summary_df[summary_df["분류"]=="안전자산"]
 
-    # 공격자산 4개가 모두 모멘텀 > 0 인지 체크
-    if all((aggr["모멘텀점수(가중합,%)"] > 0).fillna(False)):
-        tgt = aggr.loc[aggr["모멘텀점수(가중합,%)"].idxmax()]
+    # 공격자산 4개가 모두 모멘텀 > 0 인지 체크 (NaN은 비교 결과가 False라 불통과로 처리됨)
+    aggr_scores = aggr["모멘텀점수(가중합,%)"].to_numpy(dtype="float64")
+    if np.all(aggr_scores > 0):
+        tgt = aggr.iloc[np.nanargmax(aggr_scores)]
     else:
-        tgt = safe.loc[safe["모멘텀점수(가중합,%)"].idxmax()]
+        tgt = safe.iloc[np.nanargmax(safe["모멘텀점수(가중합,%)"].to_numpy(dtype="float64"))]
 
     return f"이번달 투자 대상: {tgt['실제투자_종목명']} ({tgt['실제투자_Code']})  —  기준: {tgt['의사결정기준']} / {tgt['US_Ticker']}"
 
 # =========================================================
 # 엑셀 생성
 # =========================================================
-def autosize_columns(ws, max_width=48):
-    widths = {}
-    for row in ws.iter_rows(values_only=True):
-        for i, v in enumerate(row, start=1):
-            v = "" if v is None else str(v)
-            widths[i] = max(widths.get(i, 0), len(v))
+# 스타일 객체는 공유 가능하므로 모듈 상수로 한 번만 생성 (시트 작성기들이 재사용)
+_TITLE_FILL = PatternFill("solid", fgColor="FFE6F0FF")
+_HEADER_FILL = PatternFill("solid", fgColor="FFF2F2F2")
+_THIN = Side(style="thin", color="FFD9D9D9")
+_BORDER_ALL = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_TITLE_FONT = Font(size=14, bold=True)
+_GROUP_FONT = Font(size=12, bold=True)
+_BOLD = Font(bold=True)
+_BOLD_CENTER = Alignment(horizontal="center", vertical="center")
+_CENTER = Alignment(horizontal="center")
+
+def _register_styles(wb: Workbook):
+    """시트에서 이름으로 쓰는 숫자 서식 NamedStyle을 워크북에 한 번만 등록."""
+    for name, fmt in (("percent_style", "0.00%"), ("won_style", '#,##0"원"')):
+        if name not in wb.named_styles:
+            st = NamedStyle(name=name); st.number_format = fmt; wb.add_named_style(st)
+
+def track_widths(widths: dict, row: list) -> list:
+    """행을 만들 때 열별 최대 글자 수를 바로 갱신 (기록 후 다시 훑지 않음)."""
+    for i, v in enumerate(row, start=1):
+        if isinstance(v, Cell):
+            v = v.value
+        widths[i] = max(widths.get(i, 0), len("" if v is None else str(v)))
+    return row
+
+def _apply_widths(ws, widths: dict, max_width=48):
     for i, w in widths.items():
         ws.column_dimensions[get_column_letter(i)].width = min(max(w + 2, 10), max_width)
 
+def write_rows(ws, rows, widths: dict, max_width=48):
+    """열 너비 지정 후 행을 순서대로 스트리밍 기록."""
+    _apply_widths(ws, widths, max_width=max_width)
+    for row in rows:
+        ws.append(row)
+
 def write_summary_sheet(wb: Workbook, df: pd.DataFrame, month_str: str):
     ws = wb.create_sheet("Summary")
-    title_fill = PatternFill("solid", fgColor="E6F0FF")
-    header_fill = PatternFill("solid", fgColor="F2F2F2")
-    thin = Side(style="thin", color="D9D9D9")
-    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-    if "percent_style" not in wb.named_styles:
-        st = NamedStyle(name="percent_style"); st.number_format = "0.00%"; wb.add_named_style(st)
-    if "won_style" not in wb.named_styles:
-        st = NamedStyle(name="won_style"); st.number_format = '#,##0"원"'; wb.add_named_style(st)
 
     # Banner
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(df.columns))
-    c = ws.cell(row=1, column=1, value=f"VAA Summary (EFA대체: 유로/일본 합성) — {month_str}")
-    c.font = Font(size=14, bold=True); c.fill = title_fill
-    c.alignment = Alignment(horizontal="center", vertical="center")
+    ncols = len(df.columns)
+    c = WriteOnlyCell(ws, value=f"VAA Summary (EFA대체: 유로/일본 합성) — {month_str}")
+    c.font = _TITLE_FONT; c.fill = _TITLE_FILL
+    c.alignment = _BOLD_CENTER
+    ws.merged_cells.add(f"A1:{get_column_letter(ncols)}1")
     ws.row_dimensions[1].height = 24
+    rows, widths = [], {}
+    def add(row): rows.append(track_widths(widths, row))
+    add([c] + [None] * (ncols - 1))
 
     # Header
-    for col, h in enumerate(df.columns, start=1):
-        cell = ws.cell(row=2, column=col, value=h)
-        cell.font = Font(bold=True); cell.fill = header_fill
-        cell.border = border_all; cell.alignment = Alignment(horizontal="center", vertical="center")
+    header = []
+    for h in df.columns:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = _BOLD; cell.fill = _HEADER_FILL
+        cell.border = _BORDER_ALL; cell.alignment = _BOLD_CENTER
+        header.append(cell)
+    add(header)
 
     # Data
-    start_row = 3
-    for r_idx, row in enumerate(df.itertuples(index=False), start=start_row):
+    for row in df.itertuples(index=False):
+        cells = []
         for c_idx, val in enumerate(row, start=1):
-            cell = ws.cell(row=r_idx, column=c_idx, value=val)
-            cell.border = border_all
+            cell = WriteOnlyCell(ws, value=val)
+            cell.border = _BORDER_ALL
             header = df.columns[c_idx-1]
             if header.endswith("(%)") and isinstance(val, (int, float)):
                 cell.value = val / 100.0
                 cell.style = "percent_style"
             if header.endswith("(KRW)") and isinstance(val, (int, float)):
                 cell.style = "won_style"
+            cells.append(cell)
+        add(cells)
 
     ws.freeze_panes = "A3"
-    ws.auto_filter.ref = f"A2:{get_column_letter(len(df.columns))}{ws.max_row}"
-    autosize_columns(ws, max_width=44)
+    ws.auto_filter.ref = f"A2:{get_column_letter(ncols)}{len(rows)}"
+    write_rows(ws, rows, widths, max_width=44)
 
 def write_detail_sheet(wb: Workbook, df: pd.DataFrame, banner: str, month_str: str):
     ws = wb.create_sheet("Detail")
-    title_fill = PatternFill("solid", fgColor="E6F0FF")
-    header_fill = PatternFill("solid", fgColor="F2F2F2")
-    thin = Side(style="thin", color="D9D9D9")
-    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
 
-    if "percent_style" not in wb.named_styles:
-        st = NamedStyle(name="percent_style"); st.number_format = "0.00%"; wb.add_named_style(st)
-    if "won_style" not in wb.named_styles:
-        st = NamedStyle(name="won_style"); st.number_format = '#,##0"원"'; wb.add_named_style(st)
+    def cell(v, border=False):
+        c = WriteOnlyCell(ws, value=v)
+        if border: c.border = _BORDER_ALL
+        return c
 
     # Title
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=12)
-    c = ws.cell(row=1, column=1, value=f"VAA Detail (가격단위: KRW) — {month_str}")
-    c.font = Font(size=14, bold=True); c.fill = title_fill
-    c.alignment = Alignment(horizontal="center", vertical="center")
+    c = cell(f"VAA Detail (가격단위: KRW) — {month_str}")
+    c.font = _TITLE_FONT; c.fill = _TITLE_FILL
+    c.alignment = _BOLD_CENTER
+    ws.merged_cells.add("A1:L1")
     ws.row_dimensions[1].height = 24
 
-    ws.cell(row=3, column=1, value=banner).font = Font(bold=True)
-    row_cursor = 5
+    b = cell(banner); b.font = _BOLD
+    rows, widths = [], {}
+    def add(row): rows.append(track_widths(widths, row))
+    for row in ([c] + [None] * 11, [], [b], []):
+        add(row)
+
+    SCORE_MULTS = np.array([12, 4, 2, 1])  # 1/3/6/12개월 구간 배수
 
     def add_block(ar):
-        nonlocal row_cursor
-        ws.cell(row=row_cursor, column=1, value="의사결정기준"); ws.cell(row=row_cursor, column=2, value=f"{ar['의사결정기준']} / {ar['US_Ticker']}"); row_cursor += 1
-        ws.cell(row=row_cursor, column=1, value="실제 투자");   ws.cell(row=row_cursor, column=2, value=f"{ar['실제투자_종목명']} ({ar['실제투자_Code']})"); row_cursor += 1
-        ws.cell(row=row_cursor, column=1, value="환율표기");   ws.cell(row=row_cursor, column=2, value=ar["실제투자_환율"]); row_cursor += 1
-        ws.cell(row=row_cursor, column=1, value="모멘텀 스코어")
-        sc = ws.cell(row=row_cursor, column=2, value=(ar["모멘텀점수(가중합,%)"] if pd.notna(ar["모멘텀점수(가중합,%)"]) else None))
-        sc.number_format = "0.00"; row_cursor += 1
-        row_cursor += 1
+        add(["의사결정기준", f"{ar['의사결정기준']} / {ar['US_Ticker']}"])
+        add(["실제 투자", f"{ar['실제투자_종목명']} ({ar['실제투자_Code']})"])
+        add(["환율표기", ar["실제투자_환율"]])
+        sc = cell(ar["모멘텀점수(가중합,%)"] if pd.notna(ar["모멘텀점수(가중합,%)"]) else None)
+        sc.number_format = "0.00"
+        add(["모멘텀 스코어", sc])
+        add([])
 
         headers = ["구간","현재","1개월 전","3개월 전","6개월 전","12개월 전"]
-        for col, h in enumerate(headers, start=1):
-            cell = ws.cell(row=row_cursor, column=col, value=h)
-            cell.font = Font(bold=True); cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center"); cell.border = border_all
-        row_cursor += 1
+        hdr = []
+        for h in headers:
+            hc = cell(h)
+            hc.font = _BOLD; hc.fill = _HEADER_FILL
+            hc.alignment = _CENTER; hc.border = _BORDER_ALL
+            hdr.append(hc)
+        add(hdr)
 
         price_row = ["가격", ar["현재가격(KRW)"], ar["1개월전(KRW)"], ar["3개월전(KRW)"], ar["6개월전(KRW)"], ar["12개월전(KRW)"]]
+        cells = []
         for col, v in enumerate(price_row, start=1):
-            cell = ws.cell(row=row_cursor, column=col, value=v)
-            cell.border = border_all
-            if col > 1 and isinstance(v, (int, float)): cell.style = "won_style"
-        row_cursor += 1
-
-        r_row = ["각 구간 수익률", None, ar["1개월(%)"], ar["3개월(%)"], ar["6개월(%)"], ar["12개월(%)"]]
-        for col, v in enumerate(r_row, start=1):
-            if col <= 2:
-                cell = ws.cell(row=row_cursor, column=col, value=v)
-            else:
-                cell = ws.cell(row=row_cursor, column=col, value=None if pd.isna(v) else v/100.0)
-                if not pd.isna(v): cell.number_format = "0.00%"
-            cell.border = border_all
-        row_cursor += 1
-
-        mult_row = ["각 구간 배수", None, 12, 4, 2, 1]
-        for col, v in enumerate(mult_row, start=1):
-            cell = ws.cell(row=row_cursor, column=col, value=v); cell.border = border_all
-        row_cursor += 1
-
-        s1  = None if pd.isna(ar["1개월(%)"]) else ar["1개월(%)"] * 12 / 100.0
-        s3  = None if pd.isna(ar["3개월(%)"]) else ar["3개월(%)"] * 4  / 100.0
-        s6  = None if pd.isna(ar["6개월(%)"]) else ar["6개월(%)"] * 2  / 100.0
-        s12 = None if pd.isna(ar["12개월(%)"]) else ar["12개월(%)"] * 1  / 100.0
-        s_row = ["각 스코어", None, s1, s3, s6, s12]
-        for col, v in enumerate(s_row, start=1):
-            cell = ws.cell(row=row_cursor, column=col, value=v)
-            cell.border = border_all
-            if col > 2 and v is not None: cell.number_format = "0.00"
-        row_cursor += 1
-
-        for col in range(1, 6):
-            cell = ws.cell(row=row_cursor, column=col, value=""); cell.border = border_all
-        tot = ws.cell(row=row_cursor, column=6, value=(ar["모멘텀점수(가중합,%)"] if pd.notna(ar["모멘텀점수(가중합,%)"]) else None))
-        tot.number_format = "0.00"; tot.border = border_all
-        row_cursor += 2
+            pc = cell(v, border=True)
+            if col > 1 and isinstance(v, (int, float)): pc.style = "won_style"
+            cells.append(pc)
+        add(cells)
+
+        # 구간 수익률(%)과 배수를 배열로 한 번에 계산, 값이 없는 구간(NaN)은 빈 셀
+        pct = np.array([ar["1개월(%)"], ar["3개월(%)"], ar["6개월(%)"], ar["12개월(%)"]], dtype=float)
+        valid = ~np.isnan(pct)
+        rets = pct / 100.0
+        scores = pct * SCORE_MULTS / 100.0
+
+        cells = [cell("각 구간 수익률", border=True), cell(None, border=True)]
+        for ok, v in zip(valid, rets):
+            rc = cell(v if ok else None, border=True)
+            if ok: rc.number_format = "0.00%"
+            cells.append(rc)
+        add(cells)
+
+        mult_row = ["각 구간 배수", None, *SCORE_MULTS]
+        add([cell(v, border=True) for v in mult_row])
+
+        cells = [cell("각 스코어", border=True), cell(None, border=True)]
+        for ok, v in zip(valid, scores):
+            sc_ = cell(v if ok else None, border=True)
+            if ok: sc_.number_format = "0.00"
+            cells.append(sc_)
+        add(cells)
+
+        tot = cell(ar["모멘텀점수(가중합,%)"] if pd.notna(ar["모멘텀점수(가중합,%)"]) else None, border=True)
+        tot.number_format = "0.00"
+        add([cell("", border=True) for _ in range(5)] + [tot])
+        add([])
 
     for grp in ["공격자산","안전자산"]:
         sub = df[df["분류"]==grp]
         if sub.empty: continue
-        ws.cell(row=row_cursor, column=1, value=grp).font = Font(size=12, bold=True)
-        row_cursor += 1
-        for _, ar in sub.iterrows():
+        g = cell(grp); g.font = _GROUP_FONT
+        add([g])
+        for ar in sub.to_dict(orient="records"):
             add_block(ar)
 
     ws.freeze_panes = "A5"
-    autosize_columns(ws, max_width=60)
+    write_rows(ws, rows, widths, max_width=60)
 
 # =========================================================
 # 메인
@@ -421,7 +527,9 @@ def main():
     summary = build_summary_df()
     banner  = decision_banner(summary)
 
-    wb = Workbook(); wb.remove(wb.active)
+    # write-only 모드: 시트별로 행 목록을 만든 뒤 한 번에 스트리밍 기록
+    wb = Workbook(write_only=True)
+    _register_styles(wb)
     write_summary_sheet(wb, summary, month_str)
     write_detail_sheet(wb, summary, banner, month_str)
     wb.save(xlsx_path)
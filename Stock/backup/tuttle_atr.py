@@ -3,6 +3,29 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+try:
+    from numba import njit
+except ImportError:  # numba 미설치 시 순수 파이썬으로 동일하게 동작
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+@njit(cache=True)
+def _mma_ema(tr_values, period):
+    """MMA/EMA 재귀 계산을 한 루프에서 (period-1 위치를 앞 period개 평균으로 시작, 그 앞은 0)"""
+    n = len(tr_values)
+    mma = np.zeros(n)
+    ema = np.zeros(n)
+    seed = np.mean(tr_values[:period])
+    mma[period-1] = seed
+    ema[period-1] = seed
+    for i in range(period, n):
+        current_tr = tr_values[i]
+        mma[i] = (mma[i-1] * 19 + current_tr) / 20
+        ema[i] = (ema[i-1] * 19 + current_tr * 2) / 21
+    return mma, ema
+
 def export_turtle_final_v2(ticker_symbol, total_capital):
     print(f"[{ticker_symbol}] 터틀 트레이딩 분석(매수금액 포함) 생성 중... (자본금: {total_capital:,}원)")
     
@@ -18,13 +41,18 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
         return
 
     # 2. TR 계산 및 구성요소 분리
-    df['Prev Close'] = df['Close'].shift(1)
-    df.dropna(inplace=True)
-
-    df['TR1_A'] = abs(df['High'] - df['Prev Close'])
-    df['TR2_B'] = abs(df['Prev Close'] - df['Low'])
-    df['TR3_C'] = df['High'] - df['Low']
-    df['TR'] = df[['TR1_A', 'TR2_B', 'TR3_C']].max(axis=1)
+    # 첫 행은 전일 종가가 없으므로 배열/프레임 모두 한 칸 잘라서 맞춤 (Prev Close 열 + dropna 대신 슬라이스)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    prev = close[:-1]
+    high = df['High'].to_numpy()[1:]
+    low = df['Low'].to_numpy()[1:]
+    df = df.iloc[1:]
+
+    # 구성요소와 TR을 NumPy 배열로 한 번에 계산해 열로 붙임 (행 단위 max 없이 np.maximum.reduce)
+    tr1 = np.abs(high - prev)
+    tr2 = np.abs(prev - low)
+    tr3 = high - low
+    df = df.assign(TR1_A=tr1, TR2_B=tr2, TR3_C=tr3, TR=np.maximum.reduce([tr1, tr2, tr3]))
 
     # 3. 이동평균 계산 (SMA, MMA, EMA)
     tr_values = df['TR'].values
@@ -32,27 +60,17 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     period = 20
     
     sma_values = np.zeros(n_days)
-    mma_values = np.zeros(n_days)
-    ema_values = np.zeros(n_days)
     
     if n_days < period:
         print("데이터 부족")
         return
 
-    # SMA 계산
-    sma_series = df['TR'].rolling(window=period).mean()
-    sma_values = sma_series.fillna(0).values
+    # SMA 계산 (누적합 차이로 20일 구간 합을 한 번에, 앞쪽 19일은 0)
+    csum = np.concatenate(([0.0], np.cumsum(tr_values, dtype=np.float64)))
+    sma_values[period-1:] = (csum[period:] - csum[:-period]) / period
 
-    # MMA, EMA 초기값
-    first_seed = np.mean(tr_values[:period])
-    mma_values[period-1] = first_seed
-    ema_values[period-1] = first_seed
-
-    # MMA, EMA 재귀적 계산
-    for i in range(period, n_days):
-        current_tr = tr_values[i]
-        mma_values[i] = (mma_values[i-1] * 19 + current_tr) / 20
-        ema_values[i] = (ema_values[i-1] * 19 + current_tr * 2) / 21
+    # MMA, EMA 재귀적 계산 (초기값: 앞 20일 TR 평균)
+    mma_values, ema_values = _mma_ema(tr_values.astype(np.float64), period)
 
     df['ATR_SMA_20'] = sma_values
     df['ATR_MMA_20'] = mma_values
@@ -67,11 +85,15 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     output_df = output_df.tail(60)
     
     int_cols = ['TR1_A', 'TR2_B', 'TR3_C', 'TR', 'ATR_SMA_20', 'ATR_MMA_20', 'ATR_EMA_20']
-    output_df[int_cols] = output_df[int_cols].fillna(0).round().astype(int)
+    # 결측→0, 반올림(np.rint: round()와 같은 half-to-even), 정수 변환을 NumPy 한 번으로
+    # (float32는 가수부 24비트라 큰 원화 값이 틀어질 수 있어 쓰지 않고, 정수 ATR/TR은 int32로 충분)
+    arr = np.nan_to_num(output_df[int_cols].to_numpy(dtype=np.float64), nan=0.0)
+    output_df[int_cols] = np.rint(arr).astype(np.int32)
     output_df.index = output_df.index.strftime('%Y.%m.%d')
 
     # 5. 매수 수량 및 금액 계산
-    current_price = int(output_df['Close'].iloc[-1])
+    close_arr = output_df['Close'].to_numpy()  # 현재가/차트 최소값은 이 배열에서 바로 꺼냄
+    current_price = int(close_arr[-1])
     current_atr = int(output_df['ATR_EMA_20'].iloc[-1])
     if current_atr <= 0: current_atr = 1
 
@@ -97,6 +119,8 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 6. 엑셀 저장
     # -------------------------------------------------------
     file_name = f"{ticker_symbol}_Turtle_Analysis_V2.xlsx"
+    # constant_memory 모드는 쓰지 않음: to_excel은 열 단위로 셀을 기록하고(행 순서 보장 안 됨),
+    # 셀 값을 들고 있지 않아 차트의 캐시 데이터도 비게 됨
     writer = pd.ExcelWriter(file_name, engine='xlsxwriter')
     
     # 상단 표가 길어졌으므로 시작 행을 조금 더 아래로 조정 (15행부터 데이터)
@@ -168,10 +192,10 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 차트 (위치는 start_row + 데이터 길이 고려)
     # -------------------------------------------------------
     data_start = start_row + 1
-    data_end = start_row + len(output_df)
+    data_end = start_row + len(close_arr)
 
     # 차트 1: 주가 (최소값 적용)
-    min_close = output_df['Close'].min()
+    min_close = close_arr.min()
     y_min = min_close * 0.99 
 
     price_chart = workbook.add_chart({'type': 'line'})
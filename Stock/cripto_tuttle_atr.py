@@ -1,9 +1,16 @@
+import argparse
 import pyupbit
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
 import time
 
+from turtle_common import ATR_PERIOD, compute_atr, make_formats, QTY_FORMAT_COIN
+
+FETCH_TIMEOUT = 30  # 티커 1개 처리(업비트 조회 + 엑셀 저장)에 잡는 대기 시간(초)
+
+
 def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     # 1. 티커 변환 및 초기 설정
     if "/" in ticker_symbol:
@@ -22,70 +29,53 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
             print(f"❌ 데이터를 찾을 수 없습니다. 티커를 확인해주세요. ({upbit_ticker})")
             return
             
-        # 컬럼명 대문자 변환 (Open, High, Low, Close, Volume)
+        # 컬럼명 대문자 변환 (Open, High, Low, Close, Volume) 후 TR/리포트에 쓰는 열만 남김
         df.columns = ['Open', 'High', 'Low', 'Close', 'Volume', 'Value']
+        df = df[['High', 'Low', 'Close']]
         
     except Exception as e:
         print(f"❌ 오류 발생: {e}")
         return
 
     # 3. TR 계산
-    df['Prev Close'] = df['Close'].shift(1)
-    df.dropna(inplace=True)
-
-    df['TR1_A'] = abs(df['High'] - df['Prev Close'])
-    df['TR2_B'] = abs(df['Prev Close'] - df['Low'])
-    df['TR3_C'] = df['High'] - df['Low']
-    df['TR'] = df[['TR1_A', 'TR2_B', 'TR3_C']].max(axis=1)
+    # 첫 행은 전일 종가가 없으므로 배열을 한 칸 잘라서 맞춤 (shift + dropna 대신 슬라이스)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    prev = close[:-1]
+    high = df['High'].to_numpy()[1:]
+    low = df['Low'].to_numpy()[1:]
+
+    # 구성요소와 TR을 NumPy 배열로 계산 (TR1~3은 엑셀 출력용으로만 보관)
+    tr1 = np.abs(high - prev)
+    tr2 = np.abs(prev - low)
+    tr3 = high - low
+    tr = np.maximum.reduce([tr1, tr2, tr3])
 
     # 4. 이동평균 (SMA, MMA, EMA)
-    tr_values = df['TR'].values
-    n_days = len(tr_values)
-    period = 20
-    
-    sma_values = np.zeros(n_days)
-    mma_values = np.zeros(n_days)
-    ema_values = np.zeros(n_days)
-    
-    if n_days < period:
+    # float64로 한 번만 맞춤 (이미 float64면 복사 없이 그대로). float32는 가수부 24비트라
+    # 1,677만(2^24)을 넘는 원화 TR/가격에서 반올림 결과가 달라질 수 있어 쓰지 않음
+    tr_values = tr.astype(np.float64, copy=False)
+    if len(tr_values) < ATR_PERIOD:
         print("❌ 데이터 부족 (최소 20일 이상 필요)")
         return
 
-    # SMA
-    sma_series = df['TR'].rolling(window=period).mean()
-    sma_values = sma_series.fillna(0).values
-
-    # MMA, EMA 초기값
-    first_seed = np.mean(tr_values[:period])
-    mma_values[period-1] = first_seed
-    ema_values[period-1] = first_seed
-
-    # 재귀적 계산
-    for i in range(period, n_days):
-        current_tr = tr_values[i]
-        mma_values[i] = (mma_values[i-1] * 19 + current_tr) / 20
-        ema_values[i] = (ema_values[i-1] * 19 + current_tr * 2) / 21
-
-    df['ATR_SMA_20'] = sma_values
-    df['ATR_MMA_20'] = mma_values
-    df['ATR_EMA_20'] = ema_values
-
-    # 앞쪽 NaN 처리
-    df.loc[df.index[:period-1], ['ATR_MMA_20', 'ATR_EMA_20']] = np.nan
+    # SMA/MMA/EMA(20) 한 번에 (MMA/EMA 초기값: 앞 20일 TR 평균, 앞쪽 19일 SMA는 0, MMA/EMA는 NaN)
+    sma_values, mma_values, ema_values = compute_atr(tr_values)
 
     # 5. 엑셀 데이터 정리
+    # 파생 열을 df에 한 열씩 붙이지 않고, 최근 60행 배열을 (60, 8)로 쌓아 정수 프레임을 한 번에 구성
     cols = ['Close', 'TR1_A', 'TR2_B', 'TR3_C', 'TR', 'ATR_SMA_20', 'ATR_MMA_20', 'ATR_EMA_20']
-    output_df = df[cols].copy()
-    output_df = output_df.tail(60)
-    
-    int_cols = ['TR1_A', 'TR2_B', 'TR3_C', 'TR', 'ATR_SMA_20', 'ATR_MMA_20', 'ATR_EMA_20']
-    output_df[int_cols] = output_df[int_cols].fillna(0).round().astype(int)
-    output_df['Close'] = output_df['Close'].fillna(0).round().astype(int)
+    arr = np.column_stack([close[1:], tr1, tr2, tr3, tr, sma_values, mma_values, ema_values])[-60:]
+
+    # 결측→0, 반올림(np.rint: round()와 같은 half-to-even), 정수 변환을 Close 포함 출력 열 전체에 NumPy 한 번으로
+    # (코인 원화 가격은 int32 한도(약 21억)에 가까워질 수 있어 int64)
+    arr = np.rint(np.nan_to_num(arr, nan=0.0)).astype(np.int64)
+    output_df = pd.DataFrame(arr, index=df.index[1:][-60:], columns=cols)
     output_df.index = output_df.index.strftime('%Y.%m.%d')
 
     # 6. 매수 수량 및 금액 (소수점 지원)
-    current_price = int(output_df['Close'].iloc[-1])
-    current_atr = int(output_df['ATR_EMA_20'].iloc[-1])
+    # 현재가/ATR, 차트 최소값은 정수 배열에서 바로 꺼냄 (0열 Close, 마지막 열 ATR_EMA_20)
+    current_price = int(arr[-1, 0])
+    current_atr = int(arr[-1, -1])
     if current_atr <= 0: current_atr = 1
 
     risk_amt_1pct = total_capital * 0.01
@@ -108,50 +98,46 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     safe_ticker = upbit_ticker.replace("-", "_")
     file_name = f"[Cripto]{safe_ticker}.xlsx"
     
+    # 요약/데이터 표 모두 write_row로 위쪽 행부터 직접 기록
+    #   (constant_memory 모드는 셀 값을 들고 있지 않아 차트의 캐시 데이터가 비므로 쓰지 않음)
     writer = pd.ExcelWriter(file_name, engine='xlsxwriter')
     start_row = 14
-    output_df.to_excel(writer, sheet_name='Sheet1', startrow=start_row)
 
     workbook  = writer.book
-    worksheet = writer.sheets['Sheet1']
-
-    # 포맷 설정
-    fmt_title = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center'})
-    fmt_head  = workbook.add_format({'bold': True, 'bg_color': '#DDEBF7', 'border': 1, 'align': 'center', 'valign': 'vcenter'})
-    fmt_val   = workbook.add_format({'border': 1, 'num_format': '#,##0', 'align': 'center', 'valign': 'vcenter'})
-    
-    fmt_std_qty = workbook.add_format({'bold': True, 'bg_color': '#E2EFDA', 'border': 1, 'align': 'center', 'num_format': '0.0000'})
-    fmt_std_amt = workbook.add_format({'bg_color': '#E2EFDA', 'border': 1, 'num_format': '#,##0', 'align': 'center', 'font_color': '#548235'})
-    fmt_agg_qty = workbook.add_format({'bold': True, 'bg_color': '#FFF2CC', 'border': 1, 'align': 'center', 'num_format': '0.0000'})
-    fmt_agg_amt = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1, 'num_format': '#,##0', 'align': 'center', 'font_color': '#BF8F00'})
-
-    # 상단 요약
-    worksheet.merge_range('A1:H1', f"🐢 업비트 터틀 리포트 ({upbit_ticker})", fmt_title)
-    worksheet.write(2, 0, "총 투자금", fmt_head)
-    worksheet.write(2, 1, total_capital, fmt_val)
-    worksheet.write(2, 2, "현재가", fmt_head)
-    worksheet.write(2, 3, current_price, fmt_val)
-    worksheet.write(2, 4, "현재 ATR", fmt_head)
-    worksheet.write(2, 5, current_atr, fmt_val)
-    worksheet.write(2, 6, "손절가", fmt_head)
-    worksheet.write(2, 7, stop_loss, fmt_val)
-
-    # 테이블
-    worksheet.write(4, 0, "구분 (공식)", fmt_head)
-    worksheet.write(4, 1, "1% 리스크 (정석)", fmt_head)
-    worksheet.write(4, 2, "2% 리스크 (공격적)", fmt_head)
-
-    worksheet.merge_range('A6:A7', "방식 1: 나누기 1N\n(손절 시 2% 타격)", fmt_head)
-    worksheet.write(5, 1, f"수량: {qty_1n_1pct:.4f} 개", fmt_std_qty)
-    worksheet.write(6, 1, f"금액: {int(amt_1n_1pct):,} 원", fmt_std_amt)
-    worksheet.write(5, 2, f"수량: {qty_1n_2pct:.4f} 개", fmt_agg_qty)
-    worksheet.write(6, 2, f"금액: {int(amt_1n_2pct):,} 원", fmt_agg_amt)
-
-    worksheet.merge_range('A8:A9', "방식 2: 나누기 2N\n(손절 시 1% 타격)", fmt_head)
-    worksheet.write(7, 1, f"수량: {qty_2n_1pct:.4f} 개", fmt_std_qty)
-    worksheet.write(8, 1, f"금액: {int(amt_2n_1pct):,} 원", fmt_std_amt)
-    worksheet.write(7, 2, f"수량: {qty_2n_2pct:.4f} 개", fmt_agg_qty)
-    worksheet.write(8, 2, f"금액: {int(amt_2n_2pct):,} 원", fmt_agg_amt)
+    worksheet = workbook.add_worksheet('Sheet1')
+
+    # 포맷 설정 (이름 → 서식)
+    fmt = make_formats(workbook, QTY_FORMAT_COIN)
+
+    # 상단 요약 (항목명/값 쌍)
+    worksheet.merge_range('A1:H1', f"🐢 업비트 터틀 리포트 ({upbit_ticker})", fmt['title'])
+    summary = [("총 투자금", total_capital), ("현재가", current_price), ("현재 ATR", current_atr), ("손절가", stop_loss)]
+    for i, (label, value) in enumerate(summary):
+        worksheet.write(2, 2 * i, label, fmt['head'])
+        worksheet.write(2, 2 * i + 1, value, fmt['val'])
+
+    # 테이블 (병합이 아래 행까지 빈 셀을 쓰므로, 윗행 값을 먼저 채운 뒤 병합)
+    worksheet.write_row(4, 0, ["구분 (공식)", "1% 리스크 (정석)", "2% 리스크 (공격적)"], fmt['head'])
+
+    worksheet.write_number(5, 1, qty_1n_1pct, fmt['std_qty'])
+    worksheet.write_number(5, 2, qty_1n_2pct, fmt['agg_qty'])
+    worksheet.merge_range('A6:A7', "방식 1: 나누기 1N\n(손절 시 2% 타격)", fmt['head'])
+    worksheet.write_number(6, 1, int(amt_1n_1pct), fmt['std_amt'])
+    worksheet.write_number(6, 2, int(amt_1n_2pct), fmt['agg_amt'])
+
+    worksheet.write_number(7, 1, qty_2n_1pct, fmt['std_qty'])
+    worksheet.write_number(7, 2, qty_2n_2pct, fmt['agg_qty'])
+    worksheet.merge_range('A8:A9', "방식 2: 나누기 2N\n(손절 시 1% 타격)", fmt['head'])
+    worksheet.write_number(8, 1, int(amt_2n_1pct), fmt['std_amt'])
+    worksheet.write_number(8, 2, int(amt_2n_2pct), fmt['agg_amt'])
+
+    # 데이터 표 (15행부터, 날짜 + 8개 열을 행 단위 write_row)
+    if output_df.index.name is not None:
+        worksheet.write(start_row, 0, output_df.index.name, fmt['index'])
+    worksheet.write_row(start_row, 1, list(output_df.columns), fmt['index'])
+    for r, (day, *values) in enumerate(output_df.itertuples(name=None), start=start_row + 1):
+        worksheet.write(r, 0, day, fmt['index'])
+        worksheet.write_row(r, 1, values)
 
     worksheet.set_column('A:A', 20) 
     worksheet.set_column('B:C', 24) 
@@ -161,15 +147,16 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     # ★ 수정된 차트 부분 (TR, MMA 포함)
     # --------------------------------------------------------------------------
     data_start = start_row + 1
-    data_end = start_row + len(output_df)
+    data_end = start_row + len(arr)
+    cat_range = ['Sheet1', data_start, 0, data_end, 0]  # 모든 시리즈가 같은 날짜 축 사용
 
     # 1. 가격 차트
-    min_close = output_df['Close'].min()
+    min_close = arr[:, 0].min()
     y_min = min_close * 0.99 
     price_chart = workbook.add_chart({'type': 'line'})
     price_chart.add_series({
         'name':       'Close',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 1, data_end, 1],
         'line':       {'color': '#4472C4', 'width': 2.0},
     })
@@ -185,7 +172,7 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     # [추가됨] (1) Daily TR (회색 얇은 선) - 5번째 컬럼(F열)
     atr_chart.add_series({
         'name':       'Daily TR',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 5, data_end, 5], 
         'line':       {'color': '#D9D9D9', 'width': 1.0}, # 연한 회색
     })
@@ -193,7 +180,7 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     # (2) SMA 20 (녹색 점선) - 6번째 컬럼
     atr_chart.add_series({
         'name':       'SMA 20',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 6, data_end, 6], 
         'line':       {'color': '#00B050', 'width': 1.5, 'dash_type': 'dash'},
     })
@@ -201,7 +188,7 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     # [추가됨] (3) MMA 20 (파란색 실선) - 7번째 컬럼
     atr_chart.add_series({
         'name':       'MMA 20',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 7, data_end, 7], 
         'line':       {'color': '#0070C0', 'width': 1.5},
     })
@@ -209,7 +196,7 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     # (4) EMA 20 (빨간색 굵은 선) - 8번째 컬럼
     atr_chart.add_series({
         'name':       'EMA 20',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 8, data_end, 8], 
         'line':       {'color': '#FF0000', 'width': 2.5},
     })
@@ -221,35 +208,71 @@ def export_turtle_upbit_full_chart(ticker_symbol, total_capital):
     writer.close()
     print(f"✅ 완료! '{file_name}' 생성됨.")
 
+def parse_tickers(text):
+    """'BTC,ETH KRW-SOL' → ['BTC/KRW', 'ETH/KRW', 'KRW-SOL'] (쉼표/공백 구분, 심볼만 쓰면 /KRW 붙임)"""
+    tickers = [t for t in text.replace(",", " ").split() if t]
+    return [t if "/" in t or "-" in t else f"{t}/KRW" for t in tickers]
+
+def run_tickers(tickers, total_capital):
+    """
+    여러 티커를 스레드로 동시에 처리 (업비트 조회가 대부분 네트워크 대기라 스레드로 충분).
+    - 대기 한도는 제출 시점부터 전체 배치 기준: FETCH_TIMEOUT × 동시 처리 라운드 수
+    - 한도 안에 끝나지 않은 티커는 시작 전이면 취소, 이미 실행 중이면 멈출 수 없으므로 그 사실만 알림
+      (실행 중인 작업은 뒤에서 계속 돌아 나중에 엑셀이 생성될 수 있고, 프로그램 종료 시 끝날 때까지 기다림)
+    """
+    if len(tickers) == 1:
+        export_turtle_upbit_full_chart(tickers[0], total_capital)
+        return
+    workers = min(4, len(tickers))
+    rounds = -(-len(tickers) // workers)
+    ex = ThreadPoolExecutor(max_workers=workers)
+    futures = {t: ex.submit(export_turtle_upbit_full_chart, t, total_capital) for t in tickers}
+    wait(futures.values(), timeout=FETCH_TIMEOUT * rounds)
+    ex.shutdown(wait=False, cancel_futures=True)
+    for t, fut in futures.items():
+        if fut.cancelled():
+            print(f"❌ [{t}] 시간 초과로 취소 (시작 전)")
+        elif not fut.done():
+            print(f"⏳ [{t}] 시간 초과 (백그라운드에서 계속 실행 중)")
+        elif fut.exception() is not None:
+            print(f"❌ [{t}] 처리 실패: {fut.exception()!r}")
+
 # --- 메인 실행부 ---
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="업비트 터틀 리포트 (TR/MMA 차트 포함)")
+    ap.add_argument("--tickers", help="배치 실행할 코인 목록 (예: BTC,ETH,SOL). 생략하면 대화형으로 입력")
+    ap.add_argument("--capital", type=int, help="총 투자금액 (원). 생략하면 입력 받음")
+    args = ap.parse_args()
+
     print("==================================================")
     print("🐢 업비트 터틀 리포트 (TR/MMA 차트 포함 버전)")
     print("==================================================")
     
-    user_capital = 0
-    while True:
+    user_capital = args.capital or 0
+    while not user_capital:
         cap_input = input("\n💰 총 투자금액 입력 (예: 4000000) [종료: q]: ").strip().replace(",", "")
         if cap_input.lower() == 'q': exit()
         if cap_input.isdigit():
             user_capital = int(cap_input)
-            break
         else:
             print("⚠️ 숫자로만 입력해주세요.")
 
+    # 배치 모드: --tickers 목록을 한 번에 동시 처리하고 종료
+    if args.tickers:
+        run_tickers(parse_tickers(args.tickers), user_capital)
+        exit()
+
     while True:
         print(f"\n--------------------------------------------------")
         print(f"현재 설정된 투자금: {user_capital:,}원")
-        ticker = input("📈 코인 심볼 입력 (예: BTC/KRW 또는 BTC) [종료: q]: ").strip()
+        ticker = input("📈 코인 심볼 입력 (예: BTC/KRW 또는 BTC, 여러 개는 BTC,ETH) [종료: q]: ").strip()
         
         if ticker.lower() in ['q', 'quit', 'exit']:
             print("종료합니다.")
             break
         
-        if not ticker: continue
-        
         # BTC 입력시 자동 변환
-        if "/" not in ticker and "-" not in ticker:
-            ticker = f"{ticker}/KRW"
+        tickers = parse_tickers(ticker)
+        if not tickers: continue
 
-        export_turtle_upbit_full_chart(ticker, user_capital)
\ No newline at end of file
+        run_tickers(tickers, user_capital)
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+터틀 ATR 리포트 공용 모듈 (tuttle_atr.py / cripto_tuttle_atr.py에서 함께 씀).
+ATR(20) 계산 커널과 리포트 셀 서식을 한곳에 두어 주식/코인 스크립트가 같은 값을 내도록 함.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba 미설치 시 순수 파이썬으로 동일하게 동작
+    HAS_NUMBA = False
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+# ATR 기간은 20일 고정 → 커널에 상수로 박아 두고 SMA/MMA/EMA를 한 번에 계산
+ATR_PERIOD = 20
+
+# MMA/EMA 재귀 계수 (나눗셈을 루프 밖에서 한 번만: x[i] = BETA*x[i-1] + ALPHA*tr)
+ALPHA_MMA, BETA_MMA = 1.0 / 20.0, 19.0 / 20.0
+ALPHA_EMA, BETA_EMA = 2.0 / 21.0, 19.0 / 21.0
+
+@njit(cache=True)
+def _atr_20(tr_values):
+    """
+    20일 SMA/MMA/EMA를 루프 한 번으로 계산 (numba 사용 시 구간 합 20항이 상수 길이 루프로 펼쳐짐).
+    앞 19일은 SMA 0, MMA/EMA NaN. 19번째 위치에서 MMA/EMA를 앞 20일 평균으로 시작.
+    """
+    n = len(tr_values)
+    sma = np.zeros(n)
+    mma = np.full(n, np.nan)
+    ema = np.full(n, np.nan)
+    for i in range(19, n):
+        s = 0.0
+        for k in range(20):
+            s += tr_values[i - 19 + k]
+        sma[i] = s / 20
+    mma[19] = sma[19]
+    ema[19] = sma[19]
+    for i in range(20, n):
+        current_tr = tr_values[i]
+        mma[i] = BETA_MMA * mma[i-1] + ALPHA_MMA * current_tr
+        ema[i] = BETA_EMA * ema[i-1] + ALPHA_EMA * current_tr
+    return sma, mma, ema
+
+def compute_atr(tr_values):
+    """
+    ATR_SMA/MMA/EMA(20) 계산 → (sma, mma, ema).
+    numba가 없고 scipy가 있으면 SMA는 누적합 차이, MMA/EMA는 1차 IIR 필터(lfilter) 한 번 호출로 대신 계산
+    (zi에 초기값 seed를 넣어 19번째 위치부터 이어지도록 함).
+    """
+    if HAS_NUMBA or lfilter is None:
+        return _atr_20(tr_values)
+    n = len(tr_values)
+    sma = np.zeros(n)
+    csum = np.concatenate(([0.0], np.cumsum(tr_values)))
+    sma[19:] = (csum[20:] - csum[:-20]) / 20
+    mma = np.full(n, np.nan)
+    ema = np.full(n, np.nan)
+    seed = sma[19]
+    mma[19] = seed
+    ema[19] = seed
+    tail = tr_values[20:]
+    mma[20:] = lfilter([ALPHA_MMA], [1.0, -BETA_MMA], tail, zi=[seed * BETA_MMA])[0]
+    ema[20:] = lfilter([ALPHA_EMA], [1.0, -BETA_EMA], tail, zi=[seed * BETA_EMA])[0]
+    return sma, mma, ema
+
+
+# 매수 수량 표시 형식 (주식은 정수 주, 코인은 소수점 4자리 개)
+QTY_FORMAT_STOCK = '"수량: "#,##0" 주"'
+QTY_FORMAT_COIN = '"수량: "0.0000" 개"'
+
+def make_formats(workbook, qty_format):
+    """리포트 셀 서식을 통합문서당 한 번 만들어 이름으로 꺼내 씀 (xlsxwriter 서식은 통합문서에 묶임)"""
+    return {
+        'title': workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center'}),
+        'head': workbook.add_format({'bold': True, 'bg_color': '#DDEBF7', 'border': 1, 'align': 'center', 'valign': 'vcenter'}),
+        'val': workbook.add_format({'border': 1, 'num_format': '#,##0', 'align': 'center', 'valign': 'vcenter'}),
+        'index': workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}),  # pandas 헤더/인덱스 모양
+        # 스타일 (초록: 1% 정석 / 노랑: 2% 공격적)
+        'std_qty': workbook.add_format({'bold': True, 'bg_color': '#E2EFDA', 'border': 1, 'num_format': qty_format, 'align': 'center'}),
+        'std_amt': workbook.add_format({'bg_color': '#E2EFDA', 'border': 1, 'num_format': '"금액: "#,##0" 원"', 'align': 'center', 'font_color': '#548235'}), # 금액은 약간 연하게
+        'agg_qty': workbook.add_format({'bold': True, 'bg_color': '#FFF2CC', 'border': 1, 'num_format': qty_format, 'align': 'center'}),
+        'agg_amt': workbook.add_format({'bg_color': '#FFF2CC', 'border': 1, 'num_format': '"금액: "#,##0" 원"', 'align': 'center', 'font_color': '#BF8F00'}),
+    }
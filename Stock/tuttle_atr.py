@@ -1,7 +1,33 @@
 import FinanceDataReader as fdr
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from turtle_common import ATR_PERIOD, compute_atr, make_formats, QTY_FORMAT_STOCK
+
+# 시세 캐시 (parquet). 같은 날 같은 종목을 다시 조회하면 디스크에서 읽음
+CACHE_DIR = Path(".fdr_cache")
+
+def cached_reader(ticker, start):
+    """
+    fdr.DataReader(ticker, start) 결과를 티커당 parquet 하나로 캐시 (OHLCV만 보관).
+    - 캐시 파일 수정일이 오늘이고 저장된 구간이 start를 덮으면 디스크에서 읽어 start 이후만 잘라 반환
+    - 아니면 새로 받아 같은 파일에 덮어씀 (start가 날마다 바뀌어도 파일이 쌓이지 않음)
+    """
+    p = CACHE_DIR / f"{ticker.replace('/', '-')}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        df = pd.read_parquet(p, engine="pyarrow")
+        if df.attrs.get("start", "9999-99-99") <= start:  # start 기록이 없는 파일은 다시 받음
+            return df.loc[start:]
+    df = fdr.DataReader(ticker, start=start)
+    if df is None or df.empty:
+        return df
+    df = df[[c for c in ("Open", "High", "Low", "Close", "Volume") if c in df.columns]]
+    df.attrs["start"] = start
+    CACHE_DIR.mkdir(exist_ok=True)
+    df.to_parquet(p, engine="pyarrow")
+    return df
 
 def export_turtle_final_v2(ticker_symbol, total_capital):
     print(f"[{ticker_symbol}] 터틀 트레이딩 분석(매수금액 포함) 생성 중... (자본금: {total_capital:,}원)")
@@ -9,8 +35,8 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 1. 데이터 가져오기
     start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
     try:
-        df = fdr.DataReader(ticker_symbol, start=start_date)
-        if df.empty:
+        df = cached_reader(ticker_symbol, start_date)
+        if df is None or df.empty:
             print("데이터를 찾을 수 없습니다.")
             return
     except Exception as e:
@@ -18,61 +44,45 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
         return
 
     # 2. TR 계산 및 구성요소 분리
-    df['Prev Close'] = df['Close'].shift(1)
-    df.dropna(inplace=True)
-
-    df['TR1_A'] = abs(df['High'] - df['Prev Close'])
-    df['TR2_B'] = abs(df['Prev Close'] - df['Low'])
-    df['TR3_C'] = df['High'] - df['Low']
-    df['TR'] = df[['TR1_A', 'TR2_B', 'TR3_C']].max(axis=1)
+    # 첫 행은 전일 종가가 없으므로 배열을 한 칸 잘라서 맞춤 (shift + dropna 대신 슬라이스)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    prev = close[:-1]
+    high = df['High'].to_numpy()[1:]
+    low = df['Low'].to_numpy()[1:]
+
+    # 구성요소와 TR을 NumPy 배열로 계산 (TR1~3은 엑셀 출력용으로만 보관)
+    tr1 = np.abs(high - prev)
+    tr2 = np.abs(prev - low)
+    tr3 = high - low
+    tr = np.maximum.reduce([tr1, tr2, tr3])
 
     # 3. 이동평균 계산 (SMA, MMA, EMA)
-    tr_values = df['TR'].values
-    n_days = len(tr_values)
-    period = 20
-    
-    sma_values = np.zeros(n_days)
-    mma_values = np.zeros(n_days)
-    ema_values = np.zeros(n_days)
-    
-    if n_days < period:
+    # float64로 한 번만 맞춤 (이미 float64면 복사 없이 그대로). float32는 가수부 24비트라
+    # 1,677만(2^24)을 넘는 원화 TR/가격에서 반올림 결과가 달라질 수 있어 쓰지 않음
+    tr_values = tr.astype(np.float64, copy=False)
+    if len(tr_values) < ATR_PERIOD:
         print("데이터 부족")
         return
 
-    # SMA 계산
-    sma_series = df['TR'].rolling(window=period).mean()
-    sma_values = sma_series.fillna(0).values
-
-    # MMA, EMA 초기값
-    first_seed = np.mean(tr_values[:period])
-    mma_values[period-1] = first_seed
-    ema_values[period-1] = first_seed
-
-    # MMA, EMA 재귀적 계산
-    for i in range(period, n_days):
-        current_tr = tr_values[i]
-        mma_values[i] = (mma_values[i-1] * 19 + current_tr) / 20
-        ema_values[i] = (ema_values[i-1] * 19 + current_tr * 2) / 21
-
-    df['ATR_SMA_20'] = sma_values
-    df['ATR_MMA_20'] = mma_values
-    df['ATR_EMA_20'] = ema_values
-
-    # 앞쪽 NaN 처리
-    df.loc[df.index[:period-1], ['ATR_MMA_20', 'ATR_EMA_20']] = np.nan
+    # SMA/MMA/EMA(20) 한 번에 (MMA/EMA 초기값: 앞 20일 TR 평균, 앞쪽 19일 SMA는 0, MMA/EMA는 NaN)
+    sma_values, mma_values, ema_values = compute_atr(tr_values)
 
     # 4. 엑셀 출력용 데이터 정리
-    cols = ['Close', 'TR1_A', 'TR2_B', 'TR3_C', 'TR', 'ATR_SMA_20', 'ATR_MMA_20', 'ATR_EMA_20']
-    output_df = df[cols].copy()
-    output_df = output_df.tail(60)
-    
+    # 파생 열을 df에 한 열씩 붙이지 않고, 최근 60행 배열들로 출력 프레임을 한 번에 구성
     int_cols = ['TR1_A', 'TR2_B', 'TR3_C', 'TR', 'ATR_SMA_20', 'ATR_MMA_20', 'ATR_EMA_20']
-    output_df[int_cols] = output_df[int_cols].fillna(0).round().astype(int)
+    arr = np.column_stack([tr1, tr2, tr3, tr, sma_values, mma_values, ema_values])[-60:]
+    # 결측→0, 반올림(np.rint: round()와 같은 half-to-even), 정수 변환을 NumPy 한 번으로 (원화 가격/ATR은 int32로 충분)
+    arr = np.rint(np.nan_to_num(arr, nan=0.0)).astype(np.int32)
+    close_arr = df['Close'].to_numpy()[1:][-60:]  # 아래 현재가/차트 최소값도 이 배열에서 바로 꺼냄
+    output_df = pd.DataFrame(
+        {'Close': close_arr, **dict(zip(int_cols, arr.T))},
+        index=df.index[1:][-60:],
+    )
     output_df.index = output_df.index.strftime('%Y.%m.%d')
 
     # 5. 매수 수량 및 금액 계산
-    current_price = int(output_df['Close'].iloc[-1])
-    current_atr = int(output_df['ATR_EMA_20'].iloc[-1])
+    current_price = int(close_arr[-1])
+    current_atr = int(arr[-1, -1])  # ATR_EMA_20
     if current_atr <= 0: current_atr = 1
 
     risk_amt_1pct = total_capital * 0.01
@@ -97,67 +107,56 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 6. 엑셀 저장
     # -------------------------------------------------------
     file_name = f"[ST&ETF]{ticker_symbol}.xlsx"
+    # 요약/데이터 표 모두 write_row로 위쪽 행부터 직접 기록
+    #   (constant_memory 모드는 셀 값을 들고 있지 않아 차트의 캐시 데이터가 비므로 쓰지 않음)
     writer = pd.ExcelWriter(file_name, engine='xlsxwriter')
     
     # 상단 표가 길어졌으므로 시작 행을 조금 더 아래로 조정 (15행부터 데이터)
     start_row = 14
-    output_df.to_excel(writer, sheet_name='Sheet1', startrow=start_row)
 
     workbook  = writer.book
-    worksheet = writer.sheets['Sheet1']
+    worksheet = workbook.add_worksheet('Sheet1')
 
-    # 포맷 정의
-    fmt_title = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center'})
-    fmt_head  = workbook.add_format({'bold': True, 'bg_color': '#DDEBF7', 'border': 1, 'align': 'center', 'valign': 'vcenter'})
-    fmt_val   = workbook.add_format({'border': 1, 'num_format': '#,##0', 'align': 'center', 'valign': 'vcenter'})
-    
-    # 스타일 (초록: 1% 정석 / 노랑: 2% 공격적)
-    fmt_std_qty   = workbook.add_format({'bold': True, 'bg_color': '#E2EFDA', 'border': 1, 'num_format': '#,##0', 'align': 'center'})
-    fmt_std_amt   = workbook.add_format({'bg_color': '#E2EFDA', 'border': 1, 'num_format': '#,##0', 'align': 'center', 'font_color': '#548235'}) # 금액은 약간 연하게
-    
-    fmt_agg_qty  = workbook.add_format({'bold': True, 'bg_color': '#FFF2CC', 'border': 1, 'num_format': '#,##0', 'align': 'center'})
-    fmt_agg_amt  = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1, 'num_format': '#,##0', 'align': 'center', 'font_color': '#BF8F00'})
+    # 포맷 정의 (이름 → 서식)
+    fmt = make_formats(workbook, QTY_FORMAT_STOCK)
 
     # --- 상단 요약 ---
-    worksheet.merge_range('A1:H1', f"🐢 터틀 트레이딩 종합 리포트 ({ticker_symbol})", fmt_title)
-
-    # 기본 정보
-    worksheet.write(2, 0, "총 투자금", fmt_head)
-    worksheet.write(2, 1, total_capital, fmt_val)
-    worksheet.write(2, 2, "현재가", fmt_head)
-    worksheet.write(2, 3, current_price, fmt_val)
-    worksheet.write(2, 4, "현재 ATR", fmt_head)
-    worksheet.write(2, 5, current_atr, fmt_val)
-    worksheet.write(2, 6, "손절가", fmt_head)
-    worksheet.write(2, 7, stop_loss, fmt_val)
+    worksheet.merge_range('A1:H1', f"🐢 터틀 트레이딩 종합 리포트 ({ticker_symbol})", fmt['title'])
+
+    # 기본 정보 (항목명/값 쌍)
+    summary = [("총 투자금", total_capital), ("현재가", current_price), ("현재 ATR", current_atr), ("손절가", stop_loss)]
+    for i, (label, value) in enumerate(summary):
+        worksheet.write(2, 2 * i, label, fmt['head'])
+        worksheet.write(2, 2 * i + 1, value, fmt['val'])
 
     # --- 핵심 비교 표 (수량 & 금액) ---
     # [수정된 부분] 헤더 행과 내용 행의 위치 충돌 해결
     
     # 1. 헤더 (Row 4 / 엑셀 5행)
-    worksheet.write(4, 0, "구분 (공식)", fmt_head) # A5
-    worksheet.write(4, 1, "1% 리스크 (정석)", fmt_head) # B5
-    worksheet.write(4, 2, "2% 리스크 (공격적)", fmt_head) # C5
+    worksheet.write_row(4, 0, ["구분 (공식)", "1% 리스크 (정석)", "2% 리스크 (공격적)"], fmt['head'])
 
     # 2. Row 1: 방식 1 (Row 5~6 / 엑셀 6~7행 병합)
-    worksheet.merge_range('A6:A7', "방식 1: 나누기 1N\n(손절 시 2% 타격)", fmt_head)
-    
-    # 값 채우기 (방식 1)
-    worksheet.write(5, 1, f"수량: {qty_1n_1pct:,} 주", fmt_std_qty)
-    worksheet.write(6, 1, f"금액: {amt_1n_1pct:,} 원", fmt_std_amt)
-    
-    worksheet.write(5, 2, f"수량: {qty_1n_2pct:,} 주", fmt_agg_qty)
-    worksheet.write(6, 2, f"금액: {amt_1n_2pct:,} 원", fmt_agg_amt)
+    #    병합이 아래 행(7행)까지 빈 셀을 쓰므로, 윗행 값을 먼저 채운 뒤 병합
+    worksheet.write_number(5, 1, qty_1n_1pct, fmt['std_qty'])
+    worksheet.write_number(5, 2, qty_1n_2pct, fmt['agg_qty'])
+    worksheet.merge_range('A6:A7', "방식 1: 나누기 1N\n(손절 시 2% 타격)", fmt['head'])
+    worksheet.write_number(6, 1, amt_1n_1pct, fmt['std_amt'])
+    worksheet.write_number(6, 2, amt_1n_2pct, fmt['agg_amt'])
 
     # 3. Row 2: 방식 2 (Row 7~8 / 엑셀 8~9행 병합)
-    worksheet.merge_range('A8:A9', "방식 2: 나누기 2N\n(손절 시 1% 타격)", fmt_head)
-    
-    # 값 채우기 (방식 2)
-    worksheet.write(7, 1, f"수량: {qty_2n_1pct:,} 주", fmt_std_qty)
-    worksheet.write(8, 1, f"금액: {amt_2n_1pct:,} 원", fmt_std_amt)
-    
-    worksheet.write(7, 2, f"수량: {qty_2n_2pct:,} 주", fmt_agg_qty)
-    worksheet.write(8, 2, f"금액: {amt_2n_2pct:,} 원", fmt_agg_amt)
+    worksheet.write_number(7, 1, qty_2n_1pct, fmt['std_qty'])
+    worksheet.write_number(7, 2, qty_2n_2pct, fmt['agg_qty'])
+    worksheet.merge_range('A8:A9', "방식 2: 나누기 2N\n(손절 시 1% 타격)", fmt['head'])
+    worksheet.write_number(8, 1, amt_2n_1pct, fmt['std_amt'])
+    worksheet.write_number(8, 2, amt_2n_2pct, fmt['agg_amt'])
+
+    # --- 데이터 표 (15행부터, 날짜 + 8개 열을 행 단위 write_row) ---
+    if output_df.index.name is not None:
+        worksheet.write(start_row, 0, output_df.index.name, fmt['index'])
+    worksheet.write_row(start_row, 1, list(output_df.columns), fmt['index'])
+    for r, (day, *values) in enumerate(output_df.itertuples(name=None), start=start_row + 1):
+        worksheet.write(r, 0, day, fmt['index'])
+        worksheet.write_row(r, 1, values)
 
     # 컬럼 너비 조정
     worksheet.set_column('A:A', 20) 
@@ -168,16 +167,17 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 차트 (위치는 start_row + 데이터 길이 고려)
     # -------------------------------------------------------
     data_start = start_row + 1
-    data_end = start_row + len(output_df)
+    data_end = start_row + len(close_arr)
+    cat_range = ['Sheet1', data_start, 0, data_end, 0]  # 모든 시리즈가 같은 날짜 축 사용
 
     # 차트 1: 주가 (최소값 적용)
-    min_close = output_df['Close'].min()
+    min_close = close_arr.min()
     y_min = min_close * 0.99 
 
     price_chart = workbook.add_chart({'type': 'line'})
     price_chart.add_series({
         'name':       'Close',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 1, data_end, 1],
         'line':       {'color': '#4472C4', 'width': 2.0},
     })
@@ -193,7 +193,7 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 1. TR (Daily Raw) - 회색 얇은 선
     atr_chart.add_series({
         'name':       'Daily TR',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 5, data_end, 5], 
         'line':       {'color': '#BFBFBF', 'width': 1.0},
     })
@@ -201,7 +201,7 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 2. SMA 20 - 녹색 점선
     atr_chart.add_series({
         'name':       'SMA 20',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 6, data_end, 6], 
         'line':       {'color': '#00B050', 'width': 1.5, 'dash_type': 'dash'},
     })
@@ -209,7 +209,7 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 3. MMA 20 - 파란색 실선
     atr_chart.add_series({
         'name':       'MMA 20',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 7, data_end, 7], 
         'line':       {'color': '#0070C0', 'width': 1.5},
     })
@@ -217,7 +217,7 @@ def export_turtle_final_v2(ticker_symbol, total_capital):
     # 4. EMA 20 - 빨간색 굵은 실선
     atr_chart.add_series({
         'name':       'EMA 20',
-        'categories': ['Sheet1', data_start, 0, data_end, 0], 
+        'categories': cat_range, 
         'values':     ['Sheet1', data_start, 8, data_end, 8], 
         'line':       {'color': '#FF0000', 'width': 2.5},
     })
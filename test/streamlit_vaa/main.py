@@ -1,7 +1,10 @@
 # streamlit_app.py
 # -*- coding: utf-8 -*-
-import math
-from datetime import datetime, timedelta
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import numpy as np
 import pandas as pd
 import FinanceDataReader as fdr
 import streamlit as st
@@ -56,9 +59,33 @@ PALETTE = [
 CODE_ORDER = [a["종목코드"] for a in ASSETS]
 COLOR_MAP = {code: PALETTE[i % len(PALETTE)] for i, code in enumerate(CODE_ORDER)}
 
+# 라인 차트에 넘길 종목당 최대 점 수 (5년 일봉 ~1,200개는 간격을 두고 솎아서 전달)
+MAX_CHART_POINTS = 400
+
 # =========================
 # 데이터 함수
 # =========================
+# 시세 이력 디스크 캐시 (종목코드당 parquet 하나, 하루 한 번만 새로 받음)
+CACHE_DIR = Path(".fdr_cache")
+
+def cached_reader(krx_code: str, start: datetime) -> pd.DataFrame:
+    # 오늘 받은 파일이 start 이전부터 덮고 있으면 잘라서 쓰고, 아니면 새로 받아 같은 파일에 덮어씀
+    # (start가 날마다 바뀌어도 파일이 쌓이지 않음)
+    p = CACHE_DIR / f"{krx_code}.parquet"
+    start_s = f"{start:%Y-%m-%d}"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        df = pd.read_parquet(p, engine="pyarrow")
+        if df.attrs.get("start", "9999-99-99") <= start_s:  # start 기록이 없는 파일은 다시 받음
+            return df.loc[start:]
+    df = fdr.DataReader(krx_code, start)
+    if df is None or df.empty:
+        return df
+    df = df[["Close"]]
+    df.attrs["start"] = start_s
+    CACHE_DIR.mkdir(exist_ok=True)
+    df.to_parquet(p, engine="pyarrow")
+    return df
+
 @st.cache_data(ttl=300, show_spinner=False)
 def get_last_price(krx_code: str):
     df = fdr.DataReader(krx_code)
@@ -72,7 +99,7 @@ def get_last_price(krx_code: str):
 def get_price_history(krx_code: str, start: datetime | None = None) -> pd.DataFrame:
     if start is None:
         start = datetime.now() - timedelta(days=365 * 20)
-    df = fdr.DataReader(krx_code, start)
+    df = cached_reader(krx_code, start)
     if df is None or df.empty:
         raise RuntimeError(f"시세 조회 실패: {krx_code}")
     out = df[["Close"]].copy()
@@ -80,17 +107,38 @@ def get_price_history(krx_code: str, start: datetime | None = None) -> pd.DataFr
     out.sort_index(inplace=True)
     return out
 
-def to_index_100(df: pd.DataFrame) -> pd.DataFrame:
-    base = df.iloc[0]
-    return df / base * 100.0
+@st.cache_data(ttl=900, show_spinner=False)
+def load_long_history(start: datetime) -> pd.DataFrame:
+    """전 종목 종가를 (Symbol, Date) MultiIndex 세로형 프레임 하나로 묶음 (기간 변경은 슬라이스만)"""
+    # 종목별 이력 조회는 서로 독립적인 네트워크 I/O → 스레드풀로 동시에 받음 (get_price_history 캐시도 함께 채워짐)
+    # 조회에 실패한 종목은 빼고 묶음 (한 종목 실패로 차트 전체가 깨지지 않게, 누락 여부는 호출 쪽에서 확인)
+    def fetch_close(code):
+        try:
+            return get_price_history(code, start)["Close"]
+        except Exception:
+            return None
+
+    codes = [a["종목코드"] for a in ASSETS]
+    with ThreadPoolExecutor(max_workers=min(16, len(codes))) as ex:
+        hists = ex.map(fetch_close, codes)
+        closes = {c: h for c, h in zip(codes, hists) if h is not None}
+    if not closes:
+        empty_idx = pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=["Symbol", "Date"])
+        return pd.DataFrame({"Close": pd.Series(dtype=float)}, index=empty_idx)
+    long = pd.concat(closes, names=["Symbol", "Date"]).to_frame("Close")
+    return long.sort_index()
 
 def build_allocation(total_krw: int):
+    # 종목별 조회는 서로 독립적인 네트워크 I/O → 스레드풀로 동시에 요청 (결과 순서는 ASSETS 순서 유지)
+    codes = [a["종목코드"] for a in ASSETS]
+    with ThreadPoolExecutor(max_workers=min(16, len(codes))) as ex:
+        quotes = list(ex.map(get_last_price, codes))
+
     rows, dates = [], []
-    for a in ASSETS:
-        price, d = get_last_price(a["종목코드"])
+    for a, (price, d) in zip(ASSETS, quotes):
         dates.append(d)
         target_amt = total_krw * a["비율"]
-        qty = math.floor(target_amt / price)
+        qty = int(target_amt // price)
         buy_amt = qty * price
         rows.append({
             "종목명": a["종목명"],
@@ -102,20 +150,13 @@ def build_allocation(total_krw: int):
             "실제매수금액": buy_amt,
             "잔여(목표-실제)": target_amt - buy_amt,
         })
+    # 합계는 행 목록에서 바로 계산해 마지막 행으로 붙인 뒤 프레임은 한 번만 생성 (concat으로 재할당 없음)
+    totals = {c: float(np.sum([r[c] for r in rows])) for c in ("%비율", "투자금액", "실제매수금액", "잔여(목표-실제)")}
+    totals["보유수량"] = sum(r["보유수량"] for r in rows)
+    rows.append({"종목명": "합계", "종목코드": "", "현재가": None, **totals})
     df = pd.DataFrame(rows)
-    total_row = {
-        "종목명": "합계",
-        "종목코드": "",
-        "%비율": df["%비율"].sum(),
-        "현재가": None,
-        "투자금액": df["투자금액"].sum(),
-        "보유수량": int(df["보유수량"].sum()),
-        "실제매수금액": df["실제매수금액"].sum(),
-        "잔여(목표-실제)": df["잔여(목표-실제)"].sum(),
-    }
-    df = pd.concat([df, pd.DataFrame([total_row])], ignore_index=True)
     last_updated = max(dates) if dates else None
-    return df, last_updated
+    return df, totals, last_updated
 
 def format_krw(x):
     try:
@@ -145,7 +186,7 @@ with topR:
 # 데이터 빌드
 try:
     with st.spinner("가격/배분 계산 중..."):
-        df_alloc, last_updated = build_allocation(total)
+        df_alloc, totals, last_updated = build_allocation(total)
 except Exception as e:
     st.error(f"데이터 조회 중 오류가 발생했습니다: {e}")
     st.stop()
@@ -199,6 +240,10 @@ with left:
         # 기본값: 1주
         start_dt = now - timedelta(weeks=1)
 
+    # 조회는 가장 긴 기간(5년) 한 번만, 시작일은 날짜 단위로 맞춰 캐시 키를 고정
+    # (now의 시/분/초가 섞이면 rerun마다 키가 바뀌어 매번 새로 조회) → 기간 변경은 아래에서 슬라이스만
+    fetch_start = (now - timedelta(days=365 * 5)).replace(hour=0, minute=0, second=0, microsecond=0)
+
     st.write("")  # spacing
 
     # 선택한 종목 — 세로 나열 + 색상 라벨
@@ -231,23 +276,31 @@ with right:
 
     # 데이터 조립
     try:
-        series = []
-        for code in selected_codes:
-            hist = get_price_history(code, start=start_dt)  # Close
-            hist = hist.loc[hist.index >= start_dt]
-            if hist.empty:
-                continue
-            hist_100 = to_index_100(hist)
-            hist_100["Date"] = hist_100.index
-            hist_100["Symbol"] = code
-            hist_100.rename(columns={"Close": "Normalized"}, inplace=True)
-            series.append(hist_100[["Date", "Symbol", "Normalized"]])
-
-        if series:
-            df_hist = pd.concat(series, axis=0, ignore_index=True)
-            # 코드 → 종목명 변경 + 고정 색상
+        # 선택 종목/기간만 잘라 종목별 첫 종가를 기준(=100)으로 한 번에 정규화
+        # (long은 (Symbol, Date)로 정렬돼 있어 .loc 슬라이스가 불리언 마스크 없이 이진 탐색으로 위치를 찾음)
+        long = load_long_history(fetch_start)
+        loaded = set(long.index.get_level_values("Symbol"))
+        missing = [c for c in selected_codes if c not in loaded]
+        if missing:
+            st.warning(f"시세 조회에 실패해 차트에서 제외한 종목: {', '.join(missing)}")
+        selected_codes = [c for c in selected_codes if c in loaded]
+        sub = long.loc[(selected_codes, slice(start_dt, None)), "Close"]
+        base = sub.groupby(level="Symbol").transform("first")
+
+        if not sub.empty:
+            norm = sub / base * 100.0
+            # 긴 기간은 종목별로 일정 간격(step)만 남겨 점 수를 줄임 (첫 점=100 기준과 마지막 점은 항상 유지)
+            pos = norm.groupby(level="Symbol").cumcount().to_numpy()
+            size = norm.groupby(level="Symbol").transform("size").to_numpy()
+            step = -(-size // MAX_CHART_POINTS)  # 올림 나눗셈 → 종목당 최대 MAX_CHART_POINTS(+마지막 점)
+            norm = norm[(pos % step == 0) | (pos == size - 1)]
+            # 값은 툴팁 표시(.2f) 자릿수로 반올림해 차트로 넘기는 JSON을 줄임
+            # (float32는 직렬화 시 float64로 바뀌며 자릿수가 오히려 늘어 쓰지 않음)
+            df_hist = norm.round(2).rename("Normalized").reset_index()
+            # 코드 → 종목명 변경 + 고정 색상 (반복 문자열은 category로, 종목명은 카테고리 9개만 치환)
             code_to_name = {a["종목코드"]: a["종목명"] for a in ASSETS}
-            df_hist["Name"] = df_hist["Symbol"].map(code_to_name)
+            df_hist["Symbol"] = df_hist["Symbol"].astype("category")
+            df_hist["Name"] = df_hist["Symbol"].cat.rename_categories(code_to_name)
 
             # Altair 라인 차트 (고정 컬러 매핑)
             domain = [code_to_name[c] for c in selected_codes]
@@ -286,11 +339,10 @@ for c in KRW_COLS:
 
 st.dataframe(df_show, use_container_width=True, hide_index=True)
 
-leftover = df_alloc.loc[df_alloc["종목명"] == "합계", "잔여(목표-실제)"].iloc[0]
 m1, m2, m3 = st.columns(3)
-m1.metric("총 투자금액(합계)", format_krw(df_alloc.loc[df_alloc["종목명"] == "합계", "투자금액"].iloc[0]) + " 원")
-m2.metric("실제매수금액(합계)", format_krw(df_alloc.loc[df_alloc["종목명"] == "합계", "실제매수금액"].iloc[0]) + " 원")
-m3.metric("미집행 현금(잔여 합계)", format_krw(leftover) + " 원")
+m1.metric("총 투자금액(합계)", format_krw(totals["투자금액"]) + " 원")
+m2.metric("실제매수금액(합계)", format_krw(totals["실제매수금액"]) + " 원")
+m3.metric("미집행 현금(잔여 합계)", format_krw(totals["잔여(목표-실제)"]) + " 원")
 
 if last_updated:
     st.caption(f"마지막 가격 기준 시점: {last_updated.strftime('%Y-%m-%d %H:%M')}")
@@ -306,6 +358,10 @@ show_cards = st.checkbox("세부 카드 보기", value=True)
 # 카드/타이포 스타일 (작게, 컴팩트)
 st.markdown("""
 <style>
+.card-grid {
+  display: grid;
+  grid-template-columns: repeat(3, 1fr);
+}
 .card-box {
   padding: 0.8rem 0.9rem;
   margin: 0.8rem 0.9rem;
@@ -353,58 +409,58 @@ def _fmt_pct(x: float) -> str:
         return str(x)
 
 if show_cards:
-    items = df_alloc[df_alloc["종목명"] != "합계"].to_dict(orient="records")
-
-    # 3열 카드 그리드
-    for i in range(0, len(items), 3):
-        cols = st.columns(3)
-        for col, item in zip(cols, items[i:i+3]):
-            code = item["종목코드"]
-            desc = ASSET_DESC.get(code, "설명 없음")
-            name = item["종목명"]
-
-            pct = _fmt_pct(item["%비율"])
-            price = _fmt_krw(item["현재가"])
-            target_amt = _fmt_krw(item["투자금액"])
-            buy_amt = _fmt_krw(item["실제매수금액"])
-            qty = f"{int(item['보유수량']):,}"
-            leftover = _fmt_krw(item["잔여(목표-실제)"])
-
-            html = f"""
-                    <div class="card-box">
-                    <div class="card-title">{name}</div>
-                    <div class="card-code">종목코드: {code}</div>
-                    <div class="card-desc">{desc}</div>
-                    <div class="metric-grid">
-                        <div class="metric">
-                        <div class="label">목표 비중</div>
-                        <div class="value-strong">{pct}<span class="suffix">%</span></div>
-                        </div>
-                        <div class="metric">
-                        <div class="label">현재가</div>
-                        <div class="value-strong">{price}<span class="suffix">원</span></div>
-                        </div>
-                        <div class="metric">
-                        <div class="label">투자금액(목표)</div>
-                        <div class="value">{target_amt}<span class="suffix">원</span></div>
-                        </div>
-                        <div class="metric">
-                        <div class="label">실제매수금액</div>
-                        <div class="value">{buy_amt}<span class="suffix">원</span></div>
-                        </div>
-                        <div class="metric">
-                        <div class="label">보유수량(정수주)</div>
-                        <div class="value">{qty}<span class="suffix">주</span></div>
-                        </div>
-                        <div class="metric">
-                        <div class="label">잔여(목표-실제)</div>
-                        <div class="value">{leftover}<span class="suffix">원</span></div>
-                        </div>
+    items = df_alloc.iloc[:-1].to_dict(orient="records")  # 마지막 행은 합계
+
+    # 3열 카드 그리드 (카드 HTML을 모아 st.markdown 한 번으로 출력 → 요소 수 9개 → 1개)
+    cards = []
+    for item in items:
+        code = item["종목코드"]
+        desc = ASSET_DESC.get(code, "설명 없음")
+        name = item["종목명"]
+
+        pct = _fmt_pct(item["%비율"])
+        price = _fmt_krw(item["현재가"])
+        target_amt = _fmt_krw(item["투자금액"])
+        buy_amt = _fmt_krw(item["실제매수금액"])
+        qty = f"{int(item['보유수량']):,}"
+        leftover = _fmt_krw(item["잔여(목표-실제)"])
+
+        html = f"""
+                <div class="card-box">
+                <div class="card-title">{name}</div>
+                <div class="card-code">종목코드: {code}</div>
+                <div class="card-desc">{desc}</div>
+                <div class="metric-grid">
+                    <div class="metric">
+                    <div class="label">목표 비중</div>
+                    <div class="value-strong">{pct}<span class="suffix">%</span></div>
+                    </div>
+                    <div class="metric">
+                    <div class="label">현재가</div>
+                    <div class="value-strong">{price}<span class="suffix">원</span></div>
+                    </div>
+                    <div class="metric">
+                    <div class="label">투자금액(목표)</div>
+                    <div class="value">{target_amt}<span class="suffix">원</span></div>
+                    </div>
+                    <div class="metric">
+                    <div class="label">실제매수금액</div>
+                    <div class="value">{buy_amt}<span class="suffix">원</span></div>
+                    </div>
+                    <div class="metric">
+                    <div class="label">보유수량(정수주)</div>
+                    <div class="value">{qty}<span class="suffix">주</span></div>
                     </div>
+                    <div class="metric">
+                    <div class="label">잔여(목표-실제)</div>
+                    <div class="value">{leftover}<span class="suffix">원</span></div>
                     </div>
-                    """
-            with col:
-                st.markdown(html, unsafe_allow_html=True)
+                </div>
+                </div>
+                """
+        # 카드 사이에 빈 줄이 끼면 HTML 블록이 끊겨 다음 카드가 코드 블록으로 보이므로 들여쓰기/공백 제거
+        cards.append(textwrap.dedent(html).strip())
+    st.markdown('<div class="card-grid">' + "".join(cards) + "</div>", unsafe_allow_html=True)
 
 
 st.markdown(
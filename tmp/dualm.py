@@ -2,11 +2,12 @@
 # -*- coding: utf-8 -*-
 """
 Dual Momentum (Korean ETFs) – Monthly 12M return comparison + pick
-Requires: pip install finance-datareader pandas
+Requires: pip install finance-datareader pandas pyarrow
 """
 import pandas as pd
 import FinanceDataReader as fdr
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from pathlib import Path
 
@@ -32,6 +33,30 @@ OUT_DIR = Path("./dual_momentum_out")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 LOG_CSV = OUT_DIR / "dm_signals.csv"
 RET_CSV = OUT_DIR / "dm_12m_returns.csv"
+MONTHLY_CACHE = OUT_DIR / "monthly_cache.parquet"  # month-end close matrix kept across runs
+
+# On-disk cache of daily prices (one parquet per code, refreshed once per day)
+CACHE_DIR = Path(".fdr_cache")
+
+def cached_reader(code: str, start: str, end: str) -> pd.DataFrame:
+    """
+    fdr.DataReader(code, start, end) with a same-day parquet cache (OHLCV columns only).
+    One file per code: a file written today whose stored [start, end] covers the request is
+    sliced; otherwise the range is refetched and overwrites it, so daily-moving dates don't pile up.
+    """
+    p = CACHE_DIR / f"{code}.parquet"
+    if p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today():
+        df = pd.read_parquet(p, engine="pyarrow")
+        if df.attrs.get("start", "9999-99-99") <= start and df.attrs.get("end", "") >= end:
+            return df.loc[start:end]
+    df = fdr.DataReader(code, start, end)
+    if df is None or df.empty:
+        return df
+    df = df[[c for c in ("Open", "High", "Low", "Close", "Volume") if c in df.columns]]
+    df.attrs.update(start=start, end=end)
+    CACHE_DIR.mkdir(exist_ok=True)
+    df.to_parquet(p, engine="pyarrow")
+    return df
 
 def month_end(d: pd.Timestamp) -> pd.Timestamp:
     """Normalize to month-end (exchange calendar agnostic)."""
@@ -41,19 +66,50 @@ def month_end(d: pd.Timestamp) -> pd.Timestamp:
 
 def get_monthly_adjclose(code: str, start: str, end: str) -> pd.Series:
     """Fetch daily OHLCV and return month-end Adjusted Close series."""
-    df = fdr.DataReader(code, start, end)  # index: Date, columns include 'Close'
-    if df.empty:
+    df = cached_reader(code, start, end)  # index: Date, columns include 'Close'
+    if df is None or df.empty:
         raise RuntimeError(f"No data for {code}.")
     # FDR for KRX ETFs provides 'Close' (dividends are minimal; use Close as proxy).
     s = df['Close'].copy()
     s.index = pd.to_datetime(s.index)
-    m = s.resample('M').last()  # month-end close
+    # month-end close: one groupby on the monthly period key (last non-NaN close of each month),
+    # labelled with the calendar month-end date as before
+    m = s.groupby(s.index.to_period('M')).last()
+    m.index = m.index.to_timestamp(how='end').normalize()
     m.name = code
     return m
 
-def compute_12m_return(series: pd.Series) -> pd.Series:
-    """12M return: price / price_12m_ago - 1 (align to same index)."""
-    return series / series.shift(12) - 1.0
+def load_monthly_prices(codes: list, start: str, end: str) -> pd.DataFrame:
+    """
+    Month-end closes for `codes` (columns) from `start` to `end`.
+    Completed months are read from MONTHLY_CACHE; only the last cached month (possibly
+    incomplete when it was saved) onward is fetched again and appended.
+    """
+    cached = None
+    if MONTHLY_CACHE.exists():
+        cached = pd.read_parquet(MONTHLY_CACHE, engine="pyarrow")
+        if cached.empty or list(cached.columns) != codes:
+            cached = None  # different ETF set -> rebuild from scratch
+
+    fetch_start = pd.Timestamp(start)
+    if cached is not None:
+        fetch_start = max(fetch_start, cached.index[-1].replace(day=1))
+    fetch_from = fetch_start.strftime("%Y-%m-%d")
+
+    # Independent network calls -> issue them concurrently, keep ETF order
+    with ThreadPoolExecutor(max_workers=len(codes)) as ex:
+        fresh = pd.DataFrame(dict(zip(codes, ex.map(lambda c: get_monthly_adjclose(c, fetch_from, end), codes))))
+
+    if cached is not None:
+        fresh = pd.concat([cached[cached.index < month_end(fetch_start)], fresh])
+    monthly_df = fresh[fresh.index >= month_end(start)].dropna(how='all')
+    monthly_df.index.name = "DATE"
+    monthly_df.to_parquet(MONTHLY_CACHE, engine="pyarrow")
+    return monthly_df
+
+def compute_12m_return(prices: pd.Series | pd.DataFrame) -> pd.Series | pd.DataFrame:
+    """12M return: price / price_12m_ago - 1 (align to same index; works column-wise on a frame)."""
+    return prices / prices.shift(12) - 1.0
 
 def pick_asset(equity_12m: pd.Series, bond_12m: pd.Series) -> pd.Series:
     """Return a Series of chosen asset codes by month according to Dual Momentum."""
@@ -75,16 +131,11 @@ def main():
     start = (today - pd.DateOffset(years=YEARS)).strftime("%Y-%m-%d")
     end = today.strftime("%Y-%m-%d")
 
-    # Fetch monthly prices
-    monthly = {}
-    for e in ETFS + [BOND]:
-        monthly[e['code']] = get_monthly_adjclose(e['code'], start, end)
-
-    monthly_df = pd.DataFrame(monthly).dropna(how='all')
-    monthly_df.index.name = "DATE"
+    # Monthly prices (cached month-end matrix + refetch of the latest month only)
+    monthly_df = load_monthly_prices([e['code'] for e in ETFS + [BOND]], start, end)
 
-    # 12M returns
-    ret12 = monthly_df.apply(compute_12m_return).dropna(how='all')
+    # 12M returns (whole frame in one pass, no per-column apply)
+    ret12 = compute_12m_return(monthly_df).dropna(how='all')
     # Split equities vs bond
     equity_codes = [e['code'] for e in ETFS]
     bond_code = BOND['code']